@@ -0,0 +1,68 @@
+import abc
+import zlib
+import itertools
+from typing import Dict, List, Optional, Type
+from urllib.parse import urlparse
+
+class Backend:
+    """一个 quark-auto-save 实例"""
+
+    def __init__(self, number: int, http, config_manager):
+        self.number = number
+        self.http = http
+        self.config_manager = config_manager
+        self.name = urlparse(http.base_url).netloc or f"#{number}"
+        self.reserved = 0  # 已分配但尚未加入任务列表的任务数
+
+    @property
+    def available(self) -> bool:
+        return self.config_manager.loaded
+
+
+class RoutingPolicy(abc.ABC):
+    """新任务的实例选择策略"""
+
+    @abc.abstractmethod
+    def choose(self, backends: List[Backend], share_id: Optional[str]) -> Backend:
+        """从可用实例中为新分享选择一个实例"""
+
+
+class LeastTasksPolicy(RoutingPolicy):
+    """选择任务数最少的实例"""
+
+    def choose(self, backends: List[Backend], share_id: Optional[str]) -> Backend:
+        return min(backends, key=lambda backend: len(backend.config_manager.task) + backend.reserved)
+
+
+class RoundRobinPolicy(RoutingPolicy):
+    """依次轮流选择实例"""
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def choose(self, backends: List[Backend], share_id: Optional[str]) -> Backend:
+        return backends[next(self._counter) % len(backends)]
+
+
+class HashPolicy(RoutingPolicy):
+    """按分享ID哈希选择实例，同一分享总是落在同一实例"""
+
+    def choose(self, backends: List[Backend], share_id: Optional[str]) -> Backend:
+        return backends[zlib.crc32((share_id or "").encode("utf-8")) % len(backends)]
+
+
+ROUTING_POLICIES: Dict[str, Type[RoutingPolicy]] = {
+    "least_tasks": LeastTasksPolicy,
+    "round_robin": RoundRobinPolicy,
+    "hash": HashPolicy,
+}
+
+
+def parse_backends(entries: List[str]) -> List[tuple]:
+    """解析形如 "URL|API Token" 的实例配置"""
+    backends = []
+    for entry in entries or []:
+        url, _, token = str(entry).partition("|")
+        if url.strip():
+            backends.append((url.strip(), token.strip()))
+    return backends
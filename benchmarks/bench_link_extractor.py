@@ -0,0 +1,124 @@
+"""分享链接提取的微基准
+
+在模拟的聊天语料上对比旧实现（带前瞻的事件过滤正则 + 处理函数中再次 re.search）
+与 link_extractor（子串预检 + 单次扫描）的耗时。不依赖 AstrBot，可直接运行：
+    python benchmarks/bench_link_extractor.py --messages 20000 --output link_bench.json
+"""
+import os
+import re
+import json
+import time
+import random
+import argparse
+import importlib.util
+from typing import Callable, Dict, List
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_spec = importlib.util.spec_from_file_location("link_extractor", os.path.join(PLUGIN_DIR, "link_extractor.py"))
+link_extractor = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(link_extractor)
+
+# 旧实现使用的正则
+LEGACY_FILTER = r"^(?![\s\S]*\/quark)[\s\S]*?(https:\/\/pan\.quark\.cn\/s\/[a-f0-9]{12})(?:[^\n\r]*?(?:pwd|提取码|密码)\s*[=：:]?\s*([a-zA-Z0-9]{4}))?"
+LEGACY_PATTERN = r"(https:\/\/pan\.quark\.cn\/s\/[a-f0-9]{12})(?:.*?(?:pwd|提取码|密码)\s*[=：:]?\s*([a-zA-Z0-9]{4}))?"
+LEGACY_BATCH_PATTERN = r"(https:\/\/pan\.quark\.cn\/s\/[a-f0-9]{12})(?:(?:(?!https:\/\/pan\.quark\.cn\/s\/)[^\n\r])*?(?:pwd|提取码|密码)\s*[=：:]?\s*([a-zA-Z0-9]{4}))?"
+
+CHATTER = [
+    "今天的更新什么时候出来？",
+    "收到，晚点看看",
+    "这个资源已经失效了，有新的吗",
+    "哈哈哈哈哈哈",
+    "请问一下这部剧一共多少集，字幕是内嵌的还是外挂的？",
+]
+
+
+def share_id() -> str:
+    return "".join(random.choice("0123456789abcdef") for _ in range(12))
+
+
+def build_corpus(size: int) -> Dict[str, List[str]]:
+    """生成模拟聊天语料：大部分为普通聊天，其余为单链接、资源列表和指令"""
+    corpus = {"chatter": [], "single": [], "list": [], "command": []}
+    for _ in range(size):
+        roll = random.random()
+        if roll < 0.70:
+            corpus["chatter"].append("\n".join(random.choices(CHATTER, k=random.choice((1, 1, 3, 40)))))
+        elif roll < 0.85:
+            corpus["single"].append(f"【资源】某剧 全集\n链接：https://pan.quark.cn/s/{share_id()} 提取码：{share_id()[:4]}")
+        elif roll < 0.95:
+            corpus["list"].append("\n".join(
+                f"{i}. 资源{i} https://pan.quark.cn/s/{share_id()}" + (f"?pwd={share_id()[:4]}" if i % 3 == 0 else "")
+                for i in range(30)
+            ))
+        else:
+            corpus["command"].append(f"/quark update_link 1a2b3c4d https://pan.quark.cn/s/{share_id()}")
+    corpus["all"] = [message for messages in corpus.values() for message in messages]
+    return corpus
+
+
+legacy_filter = re.compile(LEGACY_FILTER)
+legacy_batch = re.compile(LEGACY_BATCH_PATTERN)
+current_filter = re.compile(link_extractor.FILTER_PATTERN)
+
+
+def legacy(message: str) -> int:
+    """基线：事件过滤 + 处理函数中只取第一个链接"""
+    if not legacy_filter.match(message):
+        return 0
+    return 1 if re.search(LEGACY_PATTERN, message) else 0
+
+
+def legacy_batch_extract(message: str) -> int:
+    """基线：事件过滤 + 处理函数中 finditer 提取所有链接"""
+    if not legacy_filter.match(message) or "/quark" in message:
+        return 0
+    return len({match.group(1) for match in legacy_batch.finditer(message)})
+
+
+def current(message: str) -> int:
+    if not current_filter.match(message) or "/quark" in message:
+        return 0
+    return len(link_extractor.extract_links(message))
+
+
+def run(name: str, category: str, func: Callable[[str], int], corpus: List[str], repeat: int) -> Dict:
+    best = float("inf")
+    links = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        links = sum(func(message) for message in corpus)
+        best = min(best, time.perf_counter() - start)
+    result = {
+        "implementation": name,
+        "category": category,
+        "messages": len(corpus),
+        "links": links,
+        "total_ms": round(best * 1000, 3),
+        "us_per_message": round(best / len(corpus) * 1e6, 3),
+    }
+    print(f"{category:<8} {name:<14} {result['us_per_message']:>9.3f}us/消息  共 {result['total_ms']:>8.1f}ms  识别链接 {links}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分享链接提取微基准")
+    parser.add_argument("--messages", type=int, default=20000, help="语料消息数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取最快一次")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", help="结果输出的 JSON 文件")
+    args = parser.parse_args()
+    random.seed(args.seed)
+    corpus = build_corpus(args.messages)
+    implementations = (("legacy", legacy), ("legacy_batch", legacy_batch_extract), ("current", current))
+    results = [
+        run(name, category, func, messages, args.repeat)
+        for category, messages in corpus.items() if messages
+        for name, func in implementations
+    ]
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""任务列表内存占用基准
+
+对比两种内存表示：
+    dict    旧实现，保留 /data 响应解析出的完整嵌套字典
+    record  TaskRecord 紧凑记录，全局配置和不常用字段序列化保存，写入时再还原
+统计加载后常驻内存、加载过程峰值、加载耗时、筛选失效任务耗时和还原完整配置（写入）的耗时。
+不依赖 AstrBot，可直接运行：
+    python benchmarks/bench_task_memory.py --tasks 1000,10000,100000 --output memory_bench.json
+    python benchmarks/bench_task_memory.py --no-orjson   # 使用标准库 json 对比
+"""
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import importlib
+import importlib.machinery
+import importlib.util
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_task_record(use_orjson: bool):
+    """以包的形式加载 task_record，不执行 main.py"""
+    if not use_orjson:
+        sys.modules["orjson"] = None
+    package = importlib.util.module_from_spec(importlib.machinery.ModuleSpec("quarksave_bench", None, is_package=True))
+    package.__path__ = [PLUGIN_DIR]
+    sys.modules["quarksave_bench"] = package
+    return importlib.import_module("quarksave_bench.task_record")
+
+
+def make_task(i: int) -> Dict[str, Any]:
+    """生成与 quark-auto-save 实际任务字段相近的任务"""
+    task = {
+        "taskname": f"某剧第{i}部",
+        "shareurl": f"https://pan.quark.cn/s/{i:012x}" + ("?pwd=ab12" if i % 4 == 0 else ""),
+        "savepath": f"/astrbot/quark_save/某剧第{i}部",
+        "pattern": random.choice(["(.*)\\.(mp4|mkv)", "$TV", ".*"]),
+        "replace": random.choice(["", "{TASKNAME}.{SXXEXX}.{EXT}"]),
+        "enddate": "",
+        "runweek": [1, 2, 3, 4, 5, 6, 7],
+        "ignore_extension": False,
+        "startfid": "",
+        "addition": {
+            "alist_strm_gen": {"auto_gen": False},
+            "aria2": {"auto_download": False, "pause": False},
+            "emby": {"try_match": True, "media_id": ""},
+        },
+    }
+    if i % 5 == 0:
+        task["update_subdir"] = "^(4k|1080p)$"
+    if i % 20 == 0:
+        task["shareurl_ban"] = "分享地址已失效"
+    return task
+
+
+def make_body(tasks: int) -> bytes:
+    config = {
+        "cookie": ["b-user-id=benchmark; __pus=benchmark"],
+        "push_config": {"QUARK_SIGN_NOTIFY": True, "PUSH_KEY": ""},
+        "magic_regex": {"$TV": {"pattern": ".*?(S\\d{1,2}E)?P?(\\d{1,3}).*?\\.(mp4|mkv)", "replace": "\\1\\2.\\3"}},
+        "crontab": "0 8,18,20 * * *",
+        "api_token": "benchmark",
+        "plugins": {"alist": {"url": "", "token": ""}, "emby": {"url": "", "token": ""}},
+        "tasklist": [make_task(i) for i in range(tasks)],
+    }
+    return json.dumps({"success": True, "data": config}, ensure_ascii=False).encode("utf-8")
+
+
+def load_dict(body: bytes, task_record) -> Tuple[Any, Callable[[], List], Callable[[], Dict]]:
+    config = json.loads(body)["data"]
+    return config, lambda: config["tasklist"], lambda: config
+
+
+def load_record(body: bytes, task_record) -> Tuple[Any, Callable[[], List], Callable[[], Dict]]:
+    config = task_record.json_loads(body)["data"]
+    settings = task_record.json_dumps_compact({key: value for key, value in config.items() if key != "tasklist"})
+    tasks = [task_record.TaskRecord.from_dict(task) for task in config["tasklist"]]
+    del config
+
+    def materialize() -> Dict:
+        config = task_record.json_loads(settings)
+        config["tasklist"] = [task.to_dict() for task in tasks]
+        return config
+
+    return (settings, tasks), lambda: tasks, materialize
+
+
+def measure(name: str, body: bytes, loader, task_record) -> Dict[str, Any]:
+    # 先单独计时，统计内存时 tracemalloc 会明显拖慢执行
+    gc.collect()
+    start = time.perf_counter()
+    loader(body, task_record)
+    load_seconds = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    state, tasklist, materialize = loader(body, task_record)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    banned = sum(1 for task in tasklist() if task.get("shareurl_ban"))
+    filter_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    json.dumps(materialize(), sort_keys=True, ensure_ascii=False)
+    write_seconds = time.perf_counter() - start
+    del state
+    return {
+        "representation": name,
+        "retained_kb": round((current - before) / 1024, 1),
+        "peak_kb": round((peak - before) / 1024, 1),
+        "load_ms": round(load_seconds * 1000, 2),
+        "filter_ms": round(filter_seconds * 1000, 3),
+        "write_ms": round(write_seconds * 1000, 2),
+        "banned": banned,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务列表内存占用基准")
+    parser.add_argument("--tasks", default="1000,10000,100000", help="任务数量，多个用逗号分隔")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--no-orjson", dest="orjson", action="store_false", help="不使用 orjson")
+    parser.add_argument("--output", help="结果输出的 JSON 文件")
+    args = parser.parse_args()
+    task_record = load_task_record(args.orjson)
+    random.seed(args.seed)
+
+    results = []
+    for tasks in [int(value) for value in args.tasks.split(",") if value.strip()]:
+        body = make_body(tasks)
+        print(f"tasks={tasks}  响应大小={len(body) / 1024:.0f}KB  orjson={task_record.orjson is not None}")
+        for name, loader in (("dict", load_dict), ("record", load_record)):
+            result = {"tasks": tasks, **measure(name, body, loader, task_record)}
+            results.append(result)
+            print(f"  {name:<7} 常驻={result['retained_kb']:>10.1f}KB  峰值={result['peak_kb']:>10.1f}KB  "
+                  f"加载={result['load_ms']:>8.2f}ms  筛选={result['filter_ms']:>8.3f}ms  "
+                  f"还原写入={result['write_ms']:>8.2f}ms")
+        base, new = results[-2], results[-1]
+        print(f"  常驻内存 record/dict = {new['retained_kb'] / base['retained_kb']:.2f}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"orjson": task_record.orjson is not None, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
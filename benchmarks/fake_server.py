@@ -0,0 +1,158 @@
+"""本地模拟的 quark-auto-save 服务，用于离线性能测试
+
+仅实现插件用到的接口：/data、/update、/api/add_task、/get_share_detail、/run_script_now，
+支持设置响应延迟、任务数量和失败注入。
+"""
+import json
+import random
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+
+def make_tasklist(size: int, banned_ratio: float = 0.05) -> List[Dict]:
+    """生成模拟任务列表"""
+    tasklist = []
+    for i in range(size):
+        task = {
+            "taskname": f"资源{i}",
+            "shareurl": f"https://pan.quark.cn/s/{i:012x}",
+            "savepath": f"/astrbot/quark_save/资源{i}",
+            "pattern": "(.*)\\.(mp4|mkv)",
+            "replace": "",
+            "enddate": "",
+            "addition": {},
+        }
+        if banned_ratio and i % int(1 / banned_ratio) == 0:
+            task["shareurl_ban"] = "分享地址已失效"
+        tasklist.append(task)
+    return tasklist
+
+
+class FakeQuarkAutoSave:
+    """模拟的 quark-auto-save 服务
+
+    latency: 每个请求的额外延迟（秒）
+    fail_rate: 随机返回 HTTP 503 的概率
+    以 dead 开头的分享ID会返回分享失效
+    """
+
+    def __init__(self, tasks: int = 1000, latency: float = 0.0, fail_rate: float = 0.0,
+                 token: str = "benchmark", run_lines: int = 100, host: str = "127.0.0.1", port: int = 0):
+        self.config = {
+            "cookie": ["benchmark"],
+            "push_config": {},
+            "tasklist": make_tasklist(tasks),
+            "api_token": token,
+        }
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.token = token
+        self.run_lines = run_lines
+        self.host = host
+        self.port = port
+        self.requests: Dict[str, int] = defaultdict(int)
+        # 分享内容版本，touch 后分享详情中的文件列表会变化
+        self.share_versions: Dict[str, int] = defaultdict(int)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    async def start(self):
+        app = web.Application(middlewares=[self._middleware], client_max_size=1024 ** 3)
+        app.router.add_get("/data", self.data)
+        app.router.add_post("/update", self.update)
+        app.router.add_post("/api/add_task", self.add_task)
+        app.router.add_post("/get_share_detail", self.get_share_detail)
+        app.router.add_get("/run_script_now", self.run_script_now)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def touch(self, share_ids: List[str]):
+        """模拟分享有新文件"""
+        for share_id in share_ids:
+            self.share_versions[share_id] += 1
+
+    def reset_stats(self):
+        self.requests.clear()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        self.requests[request.path] += 1
+        self.bytes_in += request.content_length or 0
+        if request.query.get("token") != self.token:
+            return self._json({"success": False, "message": "未登录"})
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            return web.Response(status=503)
+        return await handler(request)
+
+    def _json(self, data: Dict) -> web.Response:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.bytes_out += len(body)
+        return web.Response(body=body, content_type="application/json")
+
+    async def data(self, request: web.Request):
+        return self._json({"success": True, "data": self.config})
+
+    async def update(self, request: web.Request):
+        data = await request.json()
+        for key, value in data.items():
+            if key != "api_token":
+                self.config[key] = value
+        return self._json({"success": True, "message": "配置更新成功"})
+
+    async def add_task(self, request: web.Request):
+        task = await request.json()
+        self.config["tasklist"].append(task)
+        return self._json({"success": True, "message": "任务添加成功", "data": task})
+
+    async def get_share_detail(self, request: web.Request):
+        data = await request.json()
+        share_id = data.get("shareurl", "").split("/s/")[-1].split("?")[0]
+        if share_id.startswith("dead"):
+            return self._json({"success": False, "data": {"error": "分享已失效"}})
+        return self._json({
+            "success": True,
+            "data": {
+                "share": {"title": f"资源 {share_id}"},
+                "list": [{"fid": share_id, "file_name": "E01.mp4", "size": 1024,
+                          "updated_at": self.share_versions[share_id]}],
+                "paths": [],
+            },
+        })
+
+    async def run_script_now(self, request: web.Request):
+        response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8"})
+        await response.prepare(request)
+        if request.query.get("task_index"):
+            # 运行单个任务时只输出少量日志
+            lines = [f"任务{i} 转存完成\n" for i in range(10)]
+        else:
+            # 运行所有任务时逐个获取分享，每个有效任务计一次请求延迟
+            for task in self.config["tasklist"]:
+                if self.latency and not task.get("shareurl_ban"):
+                    await asyncio.sleep(self.latency)
+            lines = [f"任务{i} 转存完成\n" for i in range(self.run_lines)]
+        for line in lines:
+            line = line.encode("utf-8")
+            self.bytes_out += len(line)
+            await response.write(line)
+        await response.write_eof()
+        return response
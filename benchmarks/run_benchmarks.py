@@ -0,0 +1,265 @@
+"""离线性能测试
+
+启动本地模拟的 quark-auto-save 服务，按不同任务数量驱动 QuarkSaveApi 和 QuarkSave 指令处理函数，
+统计 p50/p99 延迟、每秒请求数、传输字节数和内存峰值，结果写入 JSON 以便在版本之间对比。
+
+需在安装了 AstrBot 的环境中运行：
+    python benchmarks/run_benchmarks.py --tasks 1000,10000,100000 --output bench.json
+    python benchmarks/run_benchmarks.py --compare bench.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import inspect
+import argparse
+import platform
+import importlib
+import statistics
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from fake_server import FakeQuarkAutoSave
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+plugin_package = os.path.basename(PLUGIN_DIR)
+quark_save_api = importlib.import_module(f"{plugin_package}.quark_save_api")
+plugin_main = importlib.import_module(f"{plugin_package}.main")
+
+from astrbot.api.star import Star  # noqa: E402
+
+
+class BenchEvent:
+    """最小化的消息事件，只提供指令处理函数用到的属性"""
+
+    def __init__(self, message_str: str = ""):
+        self.message_str = message_str
+        self.unified_msg_origin = "benchmark"
+
+    def get_sender_id(self) -> str:
+        return "benchmark"
+
+    def plain_result(self, text: str) -> str:
+        return text
+
+
+class BenchContext:
+    """记录主动推送消息数量的上下文"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, umo, chain):
+        self.sent += 1
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def random_share_id(prefix: str = "") -> str:
+    return prefix + "".join(random.choice("0123456789abcdef") for _ in range(12 - len(prefix)))
+
+
+class Benchmark:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.results: List[Dict] = []
+
+    async def setup(self, tasks: int):
+        self.server = FakeQuarkAutoSave(tasks=tasks, latency=self.args.latency / 1000,
+                                        fail_rate=self.args.fail_rate, run_lines=self.args.run_lines)
+        await self.server.start()
+        self.api = quark_save_api.QuarkSaveApi({
+            "quark_auto_save_url": self.server.url,
+            "quark_auto_save_token": self.server.token,
+            "config_write_delay": self.args.write_delay / 1000,
+            "config_sync_interval": 0,
+            "list_page_size": 50,
+            "run_progress_interval": 1,
+            # 测试吞吐时不限速，队列可容纳所有并发的链接
+            "ingest_user_rate": 0,
+            "ingest_queue_size": self.args.bursts * self.args.burst,
+            "share_watch_concurrency": self.args.watch_concurrency,
+        })
+        self.context = BenchContext()
+        self.plugin = plugin_main.QuarkSave.__new__(plugin_main.QuarkSave)
+        Star.__init__(self.plugin, self.context)
+        self.plugin.quark_save = self.api
+        await self.api.initialize()
+
+    async def teardown(self):
+        await self.api.close()
+        await self.server.stop()
+
+    async def drain(self, handler, *args):
+        """执行指令处理函数并消费所有回复"""
+        return [result async for result in handler(*args)]
+
+    async def measure(self, name: str, tasks: int, ops: List[Callable[[], Any]], concurrency: int = 1):
+        self.server.reset_stats()
+        if self.args.memory:
+            tracemalloc.start()
+        latencies: List[float] = []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed(op):
+            async with semaphore:
+                start = time.perf_counter()
+                result = op()
+                if inspect.isawaitable(result):
+                    await result
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(timed(op) for op in ops))
+        elapsed = time.perf_counter() - start
+        peak = 0
+        if self.args.memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        result = {
+            "scenario": name,
+            "tasks": tasks,
+            "ops": len(ops),
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+            "ops_per_sec": round(len(ops) / elapsed, 1) if elapsed else 0.0,
+            "requests": dict(self.server.requests),
+            "requests_per_sec": round(sum(self.server.requests.values()) / elapsed, 1) if elapsed else 0.0,
+            "bytes_in": self.server.bytes_in,
+            "bytes_out": self.server.bytes_out,
+            "peak_memory_kb": round(peak / 1024, 1),
+        }
+        self.results.append(result)
+        print(f"{name:<14} tasks={tasks:<7} ops={len(ops):<6} p50={result['p50_ms']:>9.3f}ms "
+              f"p99={result['p99_ms']:>9.3f}ms ops/s={result['ops_per_sec']:>9.1f} "
+              f"out={result['bytes_out']:>11}B peak={result['peak_memory_kb']:>9.1f}KB")
+
+    async def run_size(self, tasks: int):
+        await self.setup(tasks)
+        try:
+            api, plugin, args = self.api, self.plugin, self.args
+            await self.measure("load", tasks, [api.config_manager.load for _ in range(args.loads)])
+
+            links = [f"https://pan.quark.cn/s/{random.randrange(tasks * 2):012x}" for _ in range(args.lookups)]
+            await self.measure("task_exists", tasks, [(lambda link=link: api.task_exists(link)) for link in links])
+
+            pages = max(1, tasks // 50)
+            await self.measure("list_page", tasks, [
+                (lambda: self.drain(plugin.get_list, BenchEvent(), random.randint(1, pages), ""))
+                for _ in range(args.list_pages)
+            ])
+            await self.measure("list_filter", tasks, [
+                (lambda: self.drain(plugin.get_list, BenchEvent(), 1, "ban")) for _ in range(10)
+            ])
+
+            def burst_message() -> str:
+                lines = []
+                for i in range(args.burst):
+                    share_id = random_share_id("dead" if i % 10 == 9 else "")
+                    lines.append(f"资源{i} https://pan.quark.cn/s/{share_id} 提取码：ab12")
+                return "\n".join(lines)
+
+            await self.measure("link_burst", tasks, [
+                (lambda message=burst_message(): self.drain(plugin.quark_share_link, BenchEvent(message)))
+                for _ in range(args.bursts)
+            ], concurrency=args.concurrency)
+
+            task_ids = [task_id for task_id, _ in list(api._iter_tasks())[:args.mutations]]
+            await self.measure("rename", tasks, [
+                (lambda task_id=task_id: api.rename_task(task_id, f"重命名{task_id}", None, None, None))
+                for task_id in task_ids
+            ], concurrency=args.mutations)
+
+            async def notify(text: str):
+                self.context.sent += 1
+
+            async def run_all():
+                resp = await api.run_task(None, notify)
+                await asyncio.gather(*(job.task for job in resp["data"]))
+
+            await self.measure("runall", tasks, [run_all])
+
+            # 首次检查记录指纹，之后只运行分享有变化的任务
+            await api.watcher.check()
+            changed = random.sample(range(tasks), max(1, int(tasks * args.watch_changed)))
+            self.server.touch([f"{i:012x}" for i in changed])
+            await self.measure("watch", tasks, [api.watcher.check])
+        finally:
+            await self.teardown()
+
+    async def run(self):
+        for tasks in self.args.tasks:
+            await self.run_size(tasks)
+
+
+def compare(baseline_path: str, results: List[Dict]):
+    """与基准结果对比，打印 p50/p99 的变化"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["scenario"], r["tasks"]): r for r in json.load(f)["results"]}
+    print("\n与基准对比 (当前/基准):")
+    for result in results:
+        base = baseline.get((result["scenario"], result["tasks"]))
+        if not base:
+            continue
+        ratios = []
+        for key in ("p50_ms", "p99_ms", "bytes_out", "peak_memory_kb"):
+            if base[key] and result[key]:
+                ratios.append(f"{key}={result[key] / base[key]:.2f}x")
+        print(f"{result['scenario']:<14} tasks={result['tasks']:<7} " + " ".join(ratios))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="quarksave 插件离线性能测试")
+    parser.add_argument("--tasks", default="1000,10000", help="任务数量，多个用逗号分隔，如 1000,10000,100000")
+    parser.add_argument("--latency", type=float, default=0, help="模拟服务的响应延迟（毫秒）")
+    parser.add_argument("--fail-rate", type=float, default=0, help="模拟服务返回503的概率")
+    parser.add_argument("--write-delay", type=float, default=20, help="配置写入合并延迟（毫秒）")
+    parser.add_argument("--loads", type=int, default=5, help="全量加载配置次数")
+    parser.add_argument("--lookups", type=int, default=10000, help="重复链接检查次数")
+    parser.add_argument("--list-pages", type=int, default=200, help="任务列表翻页次数")
+    parser.add_argument("--burst", type=int, default=30, help="每条消息包含的分享链接数")
+    parser.add_argument("--bursts", type=int, default=20, help="批量链接消息数")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时处理的批量链接消息数")
+    parser.add_argument("--mutations", type=int, default=50, help="并发重命名的任务数")
+    parser.add_argument("--run-lines", type=int, default=1000, help="运行所有任务时输出的行数")
+    parser.add_argument("--watch-changed", type=float, default=0.01, help="分享检查时有变化的任务比例")
+    parser.add_argument("--watch-concurrency", type=int, default=20, help="分享检查的并发数")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="不统计内存峰值（统计会拖慢执行）")
+    parser.add_argument("--output", help="结果输出的 JSON 文件")
+    parser.add_argument("--compare", help="用于对比的基准 JSON 文件")
+    args = parser.parse_args(argv)
+    args.tasks = [int(value) for value in args.tasks.split(",") if value.strip()]
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    benchmark = Benchmark(args)
+    asyncio.run(benchmark.run())
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        },
+        "results": benchmark.results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(args.compare, benchmark.results)
+
+
+if __name__ == "__main__":
+    main()
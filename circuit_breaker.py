@@ -0,0 +1,48 @@
+import time
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后熔断，冷却后放行一个探测请求（半开）"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = max(1, int(failure_threshold or 5))
+        self.reset_timeout = float(reset_timeout or 30)
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """是否允许发送请求"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self._probing = False
+        # 半开状态只放行一个探测请求
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def release(self):
+        """请求未完成（被取消等）时调用，不计成功或失败，只释放半开状态的探测名额"""
+        self._probing = False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
@@ -0,0 +1,225 @@
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from astrbot.api import logger
+from .metrics import Histogram, Metrics
+
+# 保留的用户令牌桶数量上限，超出时淘汰最久未使用的用户
+MAX_USER_BUCKETS = 1024
+
+
+class TokenBucket:
+    """令牌桶，rate 为每秒补充的令牌数，capacity 为可突发的令牌数"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens: float = 1) -> bool:
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def refund(self, tokens: float = 1):
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def retry_after(self, tokens: float = 1) -> float:
+        """距离可再获取令牌的秒数"""
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+
+class IngestItem:
+    """排队中的工作项"""
+
+    __slots__ = ("key", "user", "payload", "enqueued_at", "future")
+
+    def __init__(self, key: str, user: str, payload: Any, future: asyncio.Future):
+        self.key = key
+        self.user = user
+        self.payload = payload
+        self.enqueued_at = time.monotonic()
+        self.future = future
+
+
+class IngestQueue:
+    """有界工作队列，固定数量的工作协程按顺序处理，按用户限速并合并处理中的相同工作项
+
+    工作协程每次取出队列中已有的最多 batch_size 个工作项，通过一次 process 调用批量处理，
+    process 接收工作项内容列表，按相同顺序返回结果列表
+
+    submit 返回 (状态, 值)：
+    queued 时值为结果的 Future；rate_limited 时值为需等待的秒数；duplicate 和 full 时值为 None
+    """
+
+    def __init__(
+        self,
+        process: Callable[[List[Any]], Awaitable[List[Any]]],
+        maxsize: int = 100,
+        workers: int = 4,
+        batch_size: int = 30,
+        user_rate: float = 30,
+        user_burst: int = 30,
+        metrics: Optional[Metrics] = None,
+        name: str = "ingest",
+    ):
+        self.process = process
+        self.maxsize = max(1, int(maxsize or 100))
+        self.workers = max(1, int(workers or 4))
+        self.batch_size = max(1, int(batch_size or 1))
+        # user_rate 为每个用户每分钟可提交的数量，0 表示不限速
+        self.user_rate = max(0.0, float(user_rate or 0)) / 60
+        self.user_burst = max(1, int(user_burst or 1))
+        self.metrics = metrics
+        self.name = name
+        self.wait = Histogram()
+        self.counters: Dict[str, int] = {
+            "queued": 0, "processed": 0, "failed": 0, "duplicate": 0, "rate_limited": 0, "full": 0,
+        }
+        self.busy = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        if metrics is not None:
+            metrics.register_gauge(f"{name}_queue_depth", lambda: self.depth)
+            metrics.register_gauge(f"{name}_queue_busy_workers", lambda: self.busy)
+
+    def start(self):
+        """启动工作协程，需在事件循环中调用"""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(self.maxsize)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _bucket(self, user: str) -> TokenBucket:
+        bucket = self._buckets.get(user)
+        if bucket is None:
+            bucket = self._buckets[user] = TokenBucket(self.user_rate, self.user_burst)
+            if len(self._buckets) > MAX_USER_BUCKETS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user)
+        return bucket
+
+    def retry_after(self, user: str, count: int = 1) -> float:
+        """用户再提交 count 个工作项需等待的秒数，超过令牌桶容量时按容量计算"""
+        bucket = self._buckets.get(user)
+        if bucket is None or not self.user_rate:
+            return 0.0
+        return bucket.retry_after(min(count, bucket.capacity))
+
+    def _count(self, event: str):
+        self.counters[event] += 1
+        if self.metrics is not None:
+            self.metrics.observe_queue(self.name, event)
+
+    def submit(self, user: str, key: str, payload: Any) -> Tuple[str, Any]:
+        """提交工作项，不等待处理完成"""
+        if self._queue is None:
+            self.start()
+        if key in self._inflight:
+            self._count("duplicate")
+            return "duplicate", None
+        bucket = self._bucket(user) if self.user_rate else None
+        if bucket is not None and not bucket.acquire():
+            self._count("rate_limited")
+            return "rate_limited", bucket.retry_after()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(IngestItem(key, user, payload, future))
+        except asyncio.QueueFull:
+            # 队列已满时不消耗用户令牌
+            if bucket is not None:
+                bucket.refund()
+            self._count("full")
+            return "full", None
+        self._inflight[key] = future
+        self._count("queued")
+        return "queued", future
+
+    def _take(self, item: IngestItem) -> List[IngestItem]:
+        """在第一个工作项之后取出队列中已有的工作项，不等待新的工作项"""
+        items = [item]
+        while len(items) < self.batch_size:
+            try:
+                items.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        now = time.monotonic()
+        for item in items:
+            waited = now - item.enqueued_at
+            self.wait.observe(waited)
+            if self.metrics is not None:
+                self.metrics.observe_queue_wait(self.name, waited)
+        return items
+
+    async def _worker(self):
+        while True:
+            items = self._take(await self._queue.get())
+            self.busy += 1
+            try:
+                results = await self.process([item.payload for item in items])
+                for item, result in zip(items, results):
+                    if not item.future.done():
+                        item.future.set_result(result)
+                    self._count("processed")
+            except asyncio.CancelledError:
+                for item in items:
+                    if not item.future.done():
+                        item.future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"处理队列任务失败: {e}")
+                for item in items:
+                    self._count("failed")
+                    if not item.future.done():
+                        item.future.set_exception(e)
+            finally:
+                self.busy -= 1
+                for item in items:
+                    self._inflight.pop(item.key, None)
+                    self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "maxsize": self.maxsize,
+            "workers": self.workers,
+            "busy": self.busy,
+            "inflight": len(self._inflight),
+            "wait_count": self.wait.count,
+            "wait_avg": self.wait.sum / self.wait.count if self.wait.count else 0.0,
+            "wait_p50": self.wait.quantile(0.5),
+            "wait_p99": self.wait.quantile(0.99),
+            **self.counters,
+        }
+
+    async def close(self):
+        """停止工作协程，取消尚未处理的工作项"""
+        for worker in self._workers:
+            worker.cancel()
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for future in self._inflight.values():
+            if not future.done():
+                future.cancel()
+        self._inflight.clear()
+        self._queue = None
@@ -0,0 +1,62 @@
+import re
+from typing import List, NamedTuple, Optional
+
+QUARK_HOST = "pan.quark.cn"
+QUARK_SHARE_URL = f"https://{QUARK_HOST}/s/"
+
+# 事件过滤使用的正则，以 ^ 锚定在消息开头，使用 re.search 时也只尝试一次；
+# 贪婪匹配可直接定位到最后一个链接，不会对整条消息做前瞻扫描
+FILTER_PATTERN = r"(?s)^.*pan\.quark\.cn/s/[0-9a-f]{12}"
+
+# 以字面量开头以便正则引擎快速定位，协议部分不影响结果，因此不参与匹配
+SHARE_ID_PATTERN = r"pan\.quark\.cn/s/([0-9a-f]{12,32})"
+# 文本中没有提取码关键字时只需提取分享ID，链接后的查询串或片段（如 #/list/share）一并跳过
+SHARE_LINK_REGEX = re.compile(SHARE_ID_PATTERN + r"(?:[?#/][\x21-\x7e]*)?")
+# 一次扫描同时取出分享ID、链接查询串中的提取码（如 ?pwd=xxxx、#/list/share?pwd=xxxx）
+# 和链接之后的提取码，后者只在同一行内且下一个链接之前查找
+SHARE_LINK_PWD_REGEX = re.compile(
+    SHARE_ID_PATTERN
+    + r"(?:(?=[?#/])(?:[\x21-\x7e]*?[?&]pwd=([A-Za-z0-9]{4}))?[\x21-\x7e]*)?"
+    + r"(?:(?:(?!pan\.quark\.cn/s/)[^\n\r])*?(?:pwd|提取码|密码|访问码)[^\S\n\r]*[=:：＝]?[^\S\n\r]*((?:(?!pan\.quark\.cn/s/)[A-Za-z0-9]){4}))?"
+)
+SHARE_ID_REGEX = re.compile(r"/s/([a-f0-9]+)(?:[?#]|$)")
+
+
+class ShareLink(NamedTuple):
+    share_id: str
+    url: str  # 规范化后的链接，不含查询串和片段
+    pwd: Optional[str]
+
+
+# 直接用 tuple.__new__ 构造，跳过 NamedTuple 在 Python 层实现的 __new__，一条消息包含大量链接时开销明显
+_new_link = tuple.__new__
+
+
+def extract_links(text: str) -> List[ShareLink]:
+    """提取文本中的所有分享链接，同一分享只保留一次，优先保留带提取码的结果"""
+    if not text or QUARK_HOST not in text:
+        return []
+    # 提取码关键字都包含 "pwd" 或 "码"，文本中都没有时跳过提取码的查找
+    if "pwd" in text or "码" in text:
+        links = {}
+        for share_id, url_pwd, text_pwd in SHARE_LINK_PWD_REGEX.findall(text):
+            # 同一分享保留第一次出现的位置，优先使用带提取码的结果
+            if not links.get(share_id):
+                links[share_id] = url_pwd or text_pwd or None
+    else:
+        links = dict.fromkeys(SHARE_LINK_REGEX.findall(text))
+    return [_new_link(ShareLink, (share_id, QUARK_SHARE_URL + share_id, pwd)) for share_id, pwd in links.items()]
+
+
+def extract_link(text: str) -> Optional[ShareLink]:
+    """提取文本中的第一个分享链接"""
+    if not text or QUARK_HOST not in text:
+        return None
+    links = extract_links(text)
+    return links[0] if links else None
+
+
+def extract_share_id(share_link: str) -> Optional[str]:
+    """从分享链接中提取分享ID"""
+    match = SHARE_ID_REGEX.search(share_link or "")
+    return match.group(1) if match else None
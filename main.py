@@ -1,12 +1,31 @@
-import re
-from astrbot.api.event import filter, AstrMessageEvent, MessageEventResult
-from astrbot.api.star import Context, Star, register
+import os
+import time
+import functools
+from astrbot.api.event import filter, AstrMessageEvent, MessageEventResult, MessageChain
+from astrbot.api.star import Context, Star, register, StarTools
 from astrbot.api import logger
+from astrbot.api.message_components import File
 from .quark_save_api import QuarkSaveApi
+from .link_extractor import FILTER_PATTERN, extract_link, extract_links
 from astrbot.core.star.filter.permission import PermissionType
 
-# 用于匹配夸克网盘分享链接的正则表达式
-Quark_ShareLink_Pattern = r"(https:\/\/pan\.quark\.cn\/s\/[a-f0-9]{12})(?:.*?(?:pwd|提取码|密码)\s*[=：:]?\s*([a-zA-Z0-9]{4}))?"
+def timed(func):
+    """记录指令从收到到回复完成的耗时"""
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        error = False
+        try:
+            async for result in func(self, *args, **kwargs):
+                yield result
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.quark_save.metrics.observe_handler(func.__name__, time.perf_counter() - start, error)
+
+    return wrapper
 
 
 @register(
@@ -19,7 +38,9 @@ class QuarkSave(Star):
     def __init__(self, context: Context, config: dict):
         super().__init__(context)
         try:
-            self.quark_save = QuarkSaveApi(config)  # 传递 QuarkSave 实例
+            self.quark_save = QuarkSaveApi(
+                config, data_dir=str(StarTools.get_data_dir("astrbot_plugin_quarksave"))
+            )
         except Exception as e:
             logger.error(f"初始化QuarkSaveApi失败: {e}")
             raise
@@ -27,6 +48,9 @@ class QuarkSave(Star):
     async def initialize(self):
         await self.quark_save.initialize()
 
+    async def terminate(self):
+        await self.quark_save.close()
+
     @filter.command_group("quark")
     @filter.permission_type(PermissionType.ADMIN)
     def quark(self):
@@ -34,6 +58,7 @@ class QuarkSave(Star):
 
     @filter.permission_type(PermissionType.ADMIN)
     @quark.command("help", alias=["帮助", "helpme"])
+    @timed
     async def help(self, event: AstrMessageEvent):
         """帮助信息"""
         yield event.plain_result(
@@ -47,7 +72,7 @@ class QuarkSave(Star):
         指令格式:
         添加任务：直接发送分享链接（若有提取码请同时发送提取码）
         获取帮助：    /quark help
-        获取任务列表：/quark list
+        获取任务列表：/quark list [页码] [任务名关键词|ban]
         获取任务详情：/quark detail 任务id
         运行指定任务：/quark run 任务id
         运行所有任务：/quark runall
@@ -56,59 +81,114 @@ class QuarkSave(Star):
         修改任务目录：/quark update_dir 任务id 目录
         修改任务链接：/quark update_link 任务id 新链接
         更新任务子目录正则表达式：/quark update_subdir taskid 子目录正则表达式
+        批量导入任务：/quark import [文件路径]（或附带 JSONL/CSV 文件）
+        导出所有任务：/quark export [jsonl|csv]
+        查看后台任务：/quark jobs
+        取消后台任务：/quark cancel 后台任务id
+        查看分享详情缓存：/quark cache
+        查看链接识别队列：/quark queue
+        检查分享变化：/quark watch [run]
+        查看耗时统计：/quark stats
         """
         )
 
+    def _notifier(self, event: AstrMessageEvent):
+        """构建向当前会话推送消息的回调"""
+        umo = event.unified_msg_origin
+
+        async def notify(text: str):
+            await self.context.send_message(umo, MessageChain().message(text))
+
+        return notify
+
     @filter.permission_type(PermissionType.ADMIN)
     @quark.command("run", alias=["执行", "运行"])
-    async def run_task(self, event: AstrMessageEvent, id: int):
+    @timed
+    async def run_task(self, event: AstrMessageEvent, id: str):
         """执行单个任务"""
         if id is None:
             yield event.plain_result("请输入任务ID")
             return
-        resp = await self.quark_save.run_task(id)
-        if resp["success"] == False:
-            yield event.plain_result(resp["message"])
-        else:
-            yield event.plain_result(f'{resp["message"]}')
+        resp = await self.quark_save.run_task(id, self._notifier(event))
+        yield event.plain_result(resp["message"])
 
     @filter.permission_type(PermissionType.ADMIN)
     @quark.command("runall", alias=["执行所有", "运行所有"])
+    @timed
     async def run_all_task(self, event: AstrMessageEvent):
         """执行所有任务"""
-        resp = await self.quark_save.run_task(None)
+        resp = await self.quark_save.run_task(None, self._notifier(event))
         yield event.plain_result(
-            f"执行所有任务时耗时较久，消息会在1~3分钟内返回（取决于任务数量）"
+            f"{resp['message']}\n执行所有任务时耗时较久（取决于任务数量），可通过 /quark jobs 查看进度"
         )
-        yield event.plain_result(resp["message"])
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @quark.command("jobs", alias=["后台任务"])
+    @timed
+    async def list_jobs(self, event: AstrMessageEvent):
+        """查看后台运行任务"""
+        jobs = self.quark_save.jobs.list()
+        if not jobs:
+            yield event.plain_result("没有后台任务")
+            return
+        status_text = {"running": "运行中", "done": "已完成", "cancelled": "已取消", "failed": "失败"}
+        lines = [
+            f"#{job.id} {job.description}  状态: {status_text[job.status]}  耗时: {job.elapsed:.0f}秒  输出: {job.output_bytes}字节"
+            for job in jobs
+        ]
+        yield event.plain_result("\n".join(lines))
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @quark.command("cancel", alias=["取消"])
+    @timed
+    async def cancel_job(self, event: AstrMessageEvent, id: int):
+        """取消后台运行任务"""
+        if self.quark_save.jobs.cancel(id):
+            yield event.plain_result(f"正在取消任务 #{id}")
+        else:
+            yield event.plain_result(f"任务 #{id} 不存在或已结束")
 
     @filter.permission_type(PermissionType.ADMIN)
     @quark.command("list", alias=["列表", "任务列表"])
-    async def get_list(self, event: AstrMessageEvent):
+    @timed
+    async def get_list(self, event: AstrMessageEvent, page: int = 1, keyword: str = ""):
         """获取任务列表"""
-        resp = await self.quark_save.get_task_list()
+        resp = await self.quark_save.get_task_page(page, keyword or None)
         if resp["success"] == False:
             yield event.plain_result(f"{resp['message']}")
-        else:
-            tasklist = ""
-            for index, task in enumerate(resp["data"]):
-                tasklist += f"ID: {index}  任务名: {task['taskname']}"
-                if task.get("shareurl_ban"):
-                    tasklist += f"  当前状态：{task['shareurl_ban']}"
-                if index < len(resp["data"]) - 1:
-                    tasklist += f"\n"
-            yield event.plain_result(f"{tasklist}")
+            return
+        data = resp["data"]
+        footer = f"第 {data['page']}/{data['pages']} 页，共 {data['total']} 个任务"
+        if data["page"] < data["pages"]:
+            footer += f"，发送 /quark list {data['page'] + 1} {keyword} 查看下一页".rstrip()
+        # 按字节预算拼接，避免单条消息过长被平台截断或拒收
+        budget = self.quark_save.message_max_bytes - len(footer.encode("utf-8")) - 1
+        lines = []
+        for task_id, task in data["items"]:
+            line = f"ID: {task_id}  任务名: {task['taskname']}"
+            if task.get("shareurl_ban"):
+                line += f"  当前状态：{task['shareurl_ban']}"
+            size = len(line.encode("utf-8")) + 1
+            if size > budget:
+                lines.append("...（超出消息长度限制，请调小 list_page_size）")
+                break
+            budget -= size
+            lines.append(line)
+        lines.append(footer)
+        yield event.plain_result("\n".join(lines))
 
     @filter.permission_type(PermissionType.ADMIN)
     @quark.command("del", alias=["删除", "删除任务", "del"])
-    async def del_task(self, event: AstrMessageEvent, id: int):
+    @timed
+    async def del_task(self, event: AstrMessageEvent, id: str):
         """删除任务"""
         resp = await self.quark_save.del_task(id)
         yield event.plain_result(f"任务{id} {resp['message']}")
 
     @filter.permission_type(PermissionType.ADMIN)
     @quark.command("rename", alias=["重命名", "修改任务"])
-    async def rename(self, event: AstrMessageEvent, id: int, name: str):
+    @timed
+    async def rename(self, event: AstrMessageEvent, id: str, name: str):
         """重命名任务"""
         resp = await self.quark_save.rename_task(
             id, name, dir=None, link=None, subdir=None
@@ -117,15 +197,16 @@ class QuarkSave(Star):
 
     @filter.permission_type(PermissionType.ADMIN)
     @quark.command("update_link", alias=["修改链接", "更新链接"])
-    async def update_link(self, event: AstrMessageEvent, id: int, link: str):
+    @timed
+    async def update_link(self, event: AstrMessageEvent, id: str, link: str):
         """更新任务链接"""
-        match = re.search(Quark_ShareLink_Pattern, link)
-        if not match:
+        share = extract_link(link)
+        if not share:
             yield event.plain_result("请提供有效的分享链接")
             return
         # 提取分享链接和提取码
-        share_link = match.group(1)
-        share_pwd = match.group(2) or None
+        share_link = share.url
+        share_pwd = share.pwd
         # 检查链接是否存在
         if self.quark_save.task_exists(share_link):
             yield event.plain_result("该链接已经存在")
@@ -138,7 +219,8 @@ class QuarkSave(Star):
 
     @filter.permission_type(PermissionType.ADMIN)
     @quark.command("update_dir", alias=["修改目录", "更新目录"])
-    async def update_dir(self, event: AstrMessageEvent, id: int, dir: str):
+    @timed
+    async def update_dir(self, event: AstrMessageEvent, id: str, dir: str):
         """更新任务目录"""
         if dir is None:
             yield event.plain_result("请输入目录")
@@ -153,7 +235,8 @@ class QuarkSave(Star):
 
     @filter.permission_type(PermissionType.ADMIN)
     @quark.command("update_subdir", alias=["修改子目录", "更新子目录"])
-    async def update_subdir(self, event: AstrMessageEvent, id: int, subdir: str):
+    @timed
+    async def update_subdir(self, event: AstrMessageEvent, id: str, subdir: str):
         """更新任务子目录正则表达式"""
         if subdir is None:
             yield event.plain_result("请输入子目录正则")
@@ -165,7 +248,8 @@ class QuarkSave(Star):
 
     @filter.permission_type(PermissionType.ADMIN)
     @quark.command("detail", alias=["详情", "任务详情"])
-    async def get_detail(self, event: AstrMessageEvent, id: int):
+    @timed
+    async def get_detail(self, event: AstrMessageEvent, id: str):
         """获取任务详情"""
         resp = await self.quark_save.get_task_detail(id)
         if resp["success"] == False:
@@ -177,14 +261,109 @@ class QuarkSave(Star):
                 task_detail += f"\n当前状态: {task['shareurl_ban']}"
             if task.get("update_subdir"):
                 task_detail += f"\n子目录正则表达式: {task['update_subdir']}"
+            if len(self.quark_save.backends) > 1:
+                task_detail += f"\n所在实例: {resp['backend']}"
             yield event.plain_result(f"{task_detail}")
 
+    @filter.permission_type(PermissionType.ADMIN)
+    @quark.command("cache", alias=["缓存"])
+    @timed
+    async def cache_stats(self, event: AstrMessageEvent):
+        """查看分享详情缓存统计"""
+        stats = self.quark_save.share_cache.stats()
+        yield event.plain_result(
+            f"缓存条目: {stats['size']}/{stats['maxsize']}\n"
+            f"命中: {stats['hits']} (失效链接: {stats['negative_hits']})\n"
+            f"未命中: {stats['misses']}\n"
+            f"合并请求: {stats['coalesced']}\n"
+            f"进行中: {stats['inflight']}\n"
+            f"命中率: {stats['hit_rate']:.1%}"
+        )
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @quark.command("queue", alias=["队列"])
+    @timed
+    async def queue_stats(self, event: AstrMessageEvent):
+        """查看链接识别队列统计"""
+        stats = self.quark_save.ingest.stats()
+        yield event.plain_result(
+            f"排队中: {stats['depth']}/{stats['maxsize']}\n"
+            f"处理中: {stats['busy']}/{stats['workers']}\n"
+            f"已处理: {stats['processed']} (失败: {stats['failed']})\n"
+            f"等待时间: 平均 {stats['wait_avg'] * 1000:.0f}ms  p50≤{stats['wait_p50'] * 1000:.0f}ms  "
+            f"p99≤{stats['wait_p99'] * 1000:.0f}ms\n"
+            f"重复提交: {stats['duplicate']}\n"
+            f"限速拒绝: {stats['rate_limited']}\n"
+            f"队列已满拒绝: {stats['full']}"
+        )
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @quark.command("watch", alias=["检查"])
+    @timed
+    async def watch(self, event: AstrMessageEvent, action: str = ""):
+        """查看分享检查结果，run 立即检查并运行有变化的任务"""
+        if action == "run":
+            resp = await self.quark_save.check_shares(self._notifier(event))
+            yield event.plain_result(resp["message"])
+            return
+        watcher = self.quark_save.watcher
+        interval = f"每 {watcher.interval:.0f} 秒" if watcher.interval > 0 else "未开启定时检查"
+        status = "检查中" if watcher.running else "空闲"
+        if watcher.last_result is None:
+            yield event.plain_result(f"分享检查: {interval}，{status}\n尚未进行过检查")
+            return
+        last_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(watcher.last_result["started_at"]))
+        yield event.plain_result(
+            f"分享检查: {interval}，{status}\n上次检查: {last_time}\n"
+            + self.quark_save.format_watch_result(watcher.last_result)
+        )
+
+    async def _attached_file(self, event: AstrMessageEvent):
+        """获取消息中附带的文件路径"""
+        for component in event.get_messages():
+            if isinstance(component, File):
+                if hasattr(component, "get_file"):
+                    return await component.get_file()
+                return component.file
+        return None
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @quark.command("import", alias=["导入"])
+    @timed
+    async def import_tasks(self, event: AstrMessageEvent, path: str = ""):
+        """从 JSONL/CSV 文件批量导入任务"""
+        file_path = path or await self._attached_file(event)
+        if not file_path:
+            yield event.plain_result("请附带 JSONL/CSV 文件或提供文件路径")
+            return
+        if not os.path.isabs(file_path) and self.quark_save.data_dir:
+            file_path = os.path.join(self.quark_save.data_dir, file_path)
+        yield event.plain_result("开始导入任务，完成后会返回结果")
+        resp = await self.quark_save.import_tasks(file_path)
+        yield event.plain_result(resp["message"])
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @quark.command("export", alias=["导出"])
+    @timed
+    async def export_tasks(self, event: AstrMessageEvent, fmt: str = "jsonl"):
+        """导出所有任务为 JSONL/CSV 文件"""
+        resp = await self.quark_save.export_tasks(fmt)
+        yield event.plain_result(resp["message"])
+        if resp["success"]:
+            yield event.chain_result([File(name=os.path.basename(resp["data"]), file=resp["data"])])
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @quark.command("stats", alias=["统计"])
+    @timed
+    async def stats(self, event: AstrMessageEvent):
+        """查看接口与指令耗时统计"""
+        yield event.plain_result(self.quark_save.metrics.summary())
+
     # 监听所有消息，且只允许单聊
     @filter.permission_type(PermissionType.ADMIN)
     @filter.event_message_type(filter.EventMessageType.PRIVATE_MESSAGE)
-    @filter.regex(
-        r"^(?![\s\S]*\/quark)[\s\S]*?(https:\/\/pan\.quark\.cn\/s\/[a-f0-9]{12})(?:[^\n\r]*?(?:pwd|提取码|密码)\s*[=：:]?\s*([a-zA-Z0-9]{4}))?"
-    )
+    @filter.regex(FILTER_PATTERN)
+    @timed
     async def quark_share_link(self, event: AstrMessageEvent):
         """自动识别聊天记录中的分享链接"""
         message_str = event.message_str or ""
@@ -193,29 +372,19 @@ class QuarkSave(Star):
             # 如果消息中包含/quark指令，则不处理
             return
 
-        # 通过正则表达式匹配分享链接
-        match = re.search(Quark_ShareLink_Pattern, message_str)
-        if match:
-            share_link = match.group(1)
-            share_pwd = match.group(2) or None
-
-            # 调用quark-auto-save
-            if self.quark_save.task_exists(share_link):
-                yield event.plain_result("该链接已经存在")
-            else:
-                share_detail = await self.quark_save.get_share_detail(
-                    share_link, share_pwd
-                )
-                if share_detail["success"] == False:
-                    yield event.plain_result(share_detail["message"])
-                else:
-                    # 去除标题中的.和空格
-                    title = (
-                        share_detail["data"]["share"]["title"]
-                        .replace(".", "")
-                        .replace(" ", "")
-                    )
-                    resp = await self.quark_save.add_share_task(
-                        share_link, share_pwd, title
-                    )
-                    yield event.plain_result(f'任务 {title} {resp["message"]}')
+        # 提取消息中的所有分享链接，按分享ID去重
+        links = {share.url: share.pwd for share in extract_links(message_str)}
+        if not links:
+            return
+
+        # 通过识别队列处理，按发送者限速
+        batch = len(links) > 1
+        results = []
+        for share_link, resp in await self.quark_save.ingest_links(str(event.get_sender_id()), links):
+            # 已获取到标题的结果包含任务名，其余结果在批量时标明链接
+            prefix = f"{share_link} " if batch and "data" not in resp else ""
+            results.append(f"{prefix}{resp['message']}")
+
+        if batch:
+            results.insert(0, f"共识别到 {len(links)} 个分享链接")
+        yield event.plain_result("\n".join(results))
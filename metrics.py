@@ -0,0 +1,207 @@
+import os
+import asyncio
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+from astrbot.api import logger
+
+# 耗时直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class Histogram:
+    """固定桶直方图"""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """按桶上限估算分位数"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for index, count in enumerate(self.counts):
+            total += count
+            if total >= rank:
+                return LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else float("inf")
+        return float("inf")
+
+
+class Metrics:
+    """接口与指令的耗时、状态和流量统计"""
+
+    def __init__(self):
+        self.http_latency: Dict[str, Histogram] = defaultdict(Histogram)
+        self.http_status: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.http_errors: Dict[str, int] = defaultdict(int)
+        self.http_request_bytes: Dict[str, int] = defaultdict(int)
+        self.http_response_bytes: Dict[str, int] = defaultdict(int)
+        self.handler_latency: Dict[str, Histogram] = defaultdict(Histogram)
+        self.handler_errors: Dict[str, int] = defaultdict(int)
+        self.queue_wait: Dict[str, Histogram] = defaultdict(Histogram)
+        self.queue_events: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.gauges: Dict[str, Callable[[], float]] = {}
+
+    def observe_http(self, endpoint: str, seconds: float, status: str,
+                     request_bytes: int = 0, response_bytes: int = 0, error: bool = False):
+        self.http_latency[endpoint].observe(seconds)
+        self.http_status[(endpoint, status)] += 1
+        self.http_request_bytes[endpoint] += request_bytes
+        self.http_response_bytes[endpoint] += response_bytes
+        if error:
+            self.http_errors[endpoint] += 1
+
+    def observe_handler(self, handler: str, seconds: float, error: bool = False):
+        self.handler_latency[handler].observe(seconds)
+        if error:
+            self.handler_errors[handler] += 1
+
+    def observe_queue(self, queue: str, event: str):
+        self.queue_events[(queue, event)] += 1
+
+    def observe_queue_wait(self, queue: str, seconds: float):
+        self.queue_wait[queue].observe(seconds)
+
+    def register_gauge(self, name: str, func: Callable[[], float]):
+        """注册在导出时读取当前值的指标，如队列深度"""
+        self.gauges[name] = func
+
+    def summary(self) -> str:
+        """生成便于在聊天中阅读的统计摘要"""
+        lines = ["接口统计:"]
+        for endpoint, hist in sorted(self.http_latency.items()):
+            lines.append(
+                f"{endpoint}  请求: {hist.count}  错误: {self.http_errors[endpoint]}  "
+                f"平均: {hist.sum / hist.count * 1000:.0f}ms  p50≤{hist.quantile(0.5) * 1000:.0f}ms  "
+                f"p99≤{hist.quantile(0.99) * 1000:.0f}ms  "
+                f"发送: {self.http_request_bytes[endpoint]}B  接收: {self.http_response_bytes[endpoint]}B"
+            )
+        lines.append("指令统计:")
+        for handler, hist in sorted(self.handler_latency.items()):
+            lines.append(
+                f"{handler}  次数: {hist.count}  错误: {self.handler_errors[handler]}  "
+                f"平均: {hist.sum / hist.count * 1000:.0f}ms  p99≤{hist.quantile(0.99) * 1000:.0f}ms"
+            )
+        if self.queue_wait:
+            lines.append("队列统计:")
+            for queue, hist in sorted(self.queue_wait.items()):
+                lines.append(
+                    f"{queue}  处理: {hist.count}  等待平均: {hist.sum / hist.count * 1000:.0f}ms  "
+                    f"p99≤{hist.quantile(0.99) * 1000:.0f}ms"
+                )
+        return "\n".join(lines)
+
+    @staticmethod
+    def _histogram_lines(name: str, label: str, histograms: Dict[str, Histogram]) -> List[str]:
+        lines = [f"# TYPE {name} histogram"]
+        for key, hist in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), hist.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{label}="{key}"}} {hist.sum}')
+            lines.append(f'{name}_count{{{label}="{key}"}} {hist.count}')
+        return lines
+
+    @staticmethod
+    def _counter_lines(name: str, label: str, values: Dict[str, int]) -> List[str]:
+        lines = [f"# TYPE {name} counter"]
+        lines.extend(f'{name}{{{label}="{key}"}} {value}' for key, value in sorted(values.items()))
+        return lines
+
+    def prometheus(self) -> str:
+        """导出 Prometheus 文本格式"""
+        lines = self._histogram_lines("quarksave_http_request_duration_seconds", "endpoint", self.http_latency)
+        lines.append("# TYPE quarksave_http_requests_total counter")
+        lines.extend(
+            f'quarksave_http_requests_total{{endpoint="{endpoint}",status="{status}"}} {value}'
+            for (endpoint, status), value in sorted(self.http_status.items())
+        )
+        lines += self._counter_lines("quarksave_http_errors_total", "endpoint", self.http_errors)
+        lines += self._counter_lines("quarksave_http_request_bytes_total", "endpoint", self.http_request_bytes)
+        lines += self._counter_lines("quarksave_http_response_bytes_total", "endpoint", self.http_response_bytes)
+        lines += self._histogram_lines("quarksave_handler_duration_seconds", "handler", self.handler_latency)
+        lines += self._counter_lines("quarksave_handler_errors_total", "handler", self.handler_errors)
+        lines += self._histogram_lines("quarksave_queue_wait_seconds", "queue", self.queue_wait)
+        lines.append("# TYPE quarksave_queue_events_total counter")
+        lines.extend(
+            f'quarksave_queue_events_total{{queue="{queue}",event="{event}"}} {value}'
+            for (queue, event), value in sorted(self.queue_events.items())
+        )
+        for name, func in sorted(self.gauges.items()):
+            lines.append(f"# TYPE quarksave_{name} gauge")
+            lines.append(f"quarksave_{name} {func()}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """定时将指标写入文件，或通过本地HTTP端口提供 /metrics"""
+
+    def __init__(self, metrics: Metrics, path: Optional[str] = None, port: int = 0,
+                 interval: float = 60, host: str = "127.0.0.1"):
+        self.metrics = metrics
+        self.path = path
+        self.port = int(port or 0)
+        self.host = host
+        self.interval = max(1.0, float(interval or 60))
+        self._task: Optional[asyncio.Task] = None
+        self._runner = None
+
+    async def start(self):
+        if self.path:
+            self._task = asyncio.create_task(self._write_loop())
+        if self.port:
+            from aiohttp import web
+
+            async def handle(request):
+                return web.Response(text=self.metrics.prometheus(), content_type="text/plain", charset="utf-8")
+
+            app = web.Application()
+            app.router.add_get("/metrics", handle)
+            self._runner = web.AppRunner(app)
+            await self._runner.setup()
+            try:
+                await web.TCPSite(self._runner, self.host, self.port).start()
+                logger.info(f"指标导出地址: http://{self.host}:{self.port}/metrics")
+            except OSError as e:
+                logger.error(f"启动指标导出端口失败: {e}")
+                await self._runner.cleanup()
+                self._runner = None
+
+    def write(self):
+        """将当前指标写入文件"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.metrics.prometheus())
+        os.replace(tmp_path, self.path)
+
+    async def _write_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.write)
+            except OSError as e:
+                logger.warning(f"写入指标文件失败: {e}")
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -1,8 +1,54 @@
-import re
 import os
+import json
+import codecs
+import asyncio
+import random
+import csv
+import time
+import math
+import hashlib
+import itertools
 import aiohttp
 from astrbot.api import logger
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Set, Tuple, Union, AsyncIterator, Awaitable, Callable
+from .share_cache import ShareDetailCache
+from .link_extractor import extract_share_id
+from .run_jobs import RunJobManager
+from .ingest_queue import IngestQueue
+from .share_watch import ShareWatcher
+from .task_record import TaskRecord, json_dumps_compact, json_loads
+from .circuit_breaker import CircuitBreaker
+from .metrics import Metrics, MetricsExporter
+from .backends import Backend, ROUTING_POLICIES, parse_backends
+from .task_io import chunked, dedupe_records, iter_records, validate_records, write_export
+
+# 稳定任务ID的长度
+TASK_ID_LENGTH = 8
+
+
+def make_task_id(task: Union[TaskRecord, Dict]) -> Tuple[str, str]:
+    """根据任务内容生成稳定ID，返回 (短ID, 完整ID)，短ID冲突时使用完整ID"""
+    if isinstance(task, TaskRecord):
+        share_id = task.share_id
+    else:
+        share_id = extract_share_id(task.get("shareurl", ""))
+    if share_id:
+        return share_id[:TASK_ID_LENGTH], share_id
+    digest = hashlib.sha1(f"{task.get('taskname', '')}\0{task.get('savepath', '')}".encode("utf-8")).hexdigest()
+    return digest[:TASK_ID_LENGTH], digest
+
+
+def parse_endpoint_timeouts(value: str) -> Dict[str, float]:
+    """解析形如 "get_share_detail=20,data=10" 的接口超时配置"""
+    timeouts = {}
+    for item in (value or "").split(","):
+        endpoint, _, seconds = item.partition("=")
+        try:
+            timeouts[endpoint.strip().strip("/")] = float(seconds)
+        except ValueError:
+            if item.strip():
+                logger.warning(f"忽略无效的接口超时配置: {item}")
+    return timeouts
 
 class APIConnectionError(Exception):
     """API连接异常"""
@@ -17,10 +63,50 @@ class APIResponseError(Exception):
         logger.error(message)
 
 class HttpClient:
-    def __init__(self, base_url: str, API_Token: str = None):
+    # 幂等接口，失败时可以安全重试或对冲
+    IDEMPOTENT_ENDPOINTS = {"data", "get_share_detail"}
+
+    def __init__(self, base_url: str, API_Token: str = None, pool_size: int = 10,
+                 timeout: float = 10, connect_timeout: float = 5, retries: int = 2,
+                 retry_backoff: float = 0.5, hedge_delay: float = 0,
+                 endpoint_timeouts: Optional[Dict[str, float]] = None,
+                 breaker: Optional[CircuitBreaker] = None, metrics: Optional[Metrics] = None):
         self.base_url = base_url.rstrip('/') + '/'
         self.Token = API_Token
-        self.timeout = aiohttp.ClientTimeout(total=10)
+        self.pool_size = max(1, int(pool_size or 10))
+        self.timeout = aiohttp.ClientTimeout(total=timeout or 10, connect=connect_timeout or 5)
+        self.retries = max(0, int(retries or 0))
+        self.retry_backoff = max(0.0, float(retry_backoff or 0))
+        self.hedge_delay = max(0.0, float(hedge_delay or 0))
+        self.endpoint_timeouts = {
+            endpoint: aiohttp.ClientTimeout(total=value, connect=self.timeout.connect)
+            for endpoint, value in (endpoint_timeouts or {}).items()
+        }
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = metrics or Metrics()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取长连接会话，首次调用时创建"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                ttl_dns_cache=300,
+                keepalive_timeout=30,
+            )
+            self._session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                connector=connector,
+                headers={'Content-Type': 'application/json'},
+            )
+        return self._session
+
+    async def close(self):
+        """关闭会话，释放连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
     async def request(self, method: str, endpoint: str, **kwargs) -> Dict:
         if not self.Token:
@@ -32,214 +118,1142 @@ class HttpClient:
         params = kwargs.pop('params', {})
         if self.Token:
             params['token'] = self.Token
+        name = endpoint.strip('/')
         url = self.base_url + endpoint.lstrip('/')
+        kwargs.setdefault('timeout', self.endpoint_timeouts.get(name, self.timeout))
+        idempotent = name in self.IDEMPOTENT_ENDPOINTS
+        retries = self.retries if idempotent else 0
+        for attempt in range(retries + 1):
+            if not self.breaker.allow():
+                return {"success": False, "message": "quark-auto-save 暂时不可用，请稍后再试"}
+            try:
+                if idempotent and self.hedge_delay:
+                    result, transient = await self._send_hedged(method, name, url, params, kwargs)
+                else:
+                    result, transient = await self._send(method, name, url, params, kwargs)
+            except BaseException:
+                # 请求被取消时没有结果，释放探测名额，否则熔断器会一直停在半开状态
+                self.breaker.release()
+                raise
+            if not transient:
+                self.breaker.record_success()
+                return result
+            self.breaker.record_failure()
+            if attempt < retries:
+                # 指数退避并加入随机抖动
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+        return result
+
+    async def _send(self, method: str, name: str, url: str, params: Dict, kwargs: Dict) -> Tuple[Dict, bool]:
+        """发送一次请求，返回响应和是否为可重试的临时错误"""
+        start = time.perf_counter()
+        request_bytes = self._payload_size(kwargs)
+        status, response_bytes = "error", 0
+        result, transient = None, False
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                headers = {'Content-Type': 'application/json'}
-                async with session.request(method, url, params=params, headers=headers, **kwargs) as response:
+            session = self._get_session()
+            async with session.request(method, url, params=dict(params), **kwargs) as response:
+                status = str(response.status)
+                response_bytes = len(await response.read())
+                if response.status >= 500:
+                    logger.warning(f"API服务端错误: HTTP {response.status}")
+                    result, transient = {"success": False, "message": f"API服务端错误: HTTP {response.status}"}, True
+                else:
                     # 使用 await 等待响应的JSON解析完成
-                    response_json = await response.json()
+                    response_json = await response.json(loads=json_loads)
                     if response_json.get('success') == 'false':
                         logger.error(f"API请求失败: {response_json.get('message', '未知错误')}")
-                    return response_json
+                    result = response_json
         except aiohttp.ClientConnectorError as e:
             logger.warning(f"无法连接到 API: {e}")
-            return {"success": False, "message": "无法连接到 API，请检查 base_url 是否正确"}
+            result, transient = {"success": False, "message": "无法连接到 API，请检查 base_url 是否正确"}, True
+        except asyncio.TimeoutError:
+            logger.warning(f"API请求超时: {url}")
+            status = "timeout"
+            result, transient = {"success": False, "message": "API请求超时"}, True
         except aiohttp.ClientResponseError as e:
             logger.error(f"API响应错误: {e}")
-            return {"success": False, "message": f"API响应错误: {e}"}
+            result = {"success": False, "message": f"API响应错误: {e}"}
         except aiohttp.ClientError as e:
             logger.error(f"API客户端错误: {e}")
-            return {"success": False, "message": f"API连接错误: {e}"}
+            result, transient = {"success": False, "message": f"API连接错误: {e}"}, True
         except Exception as e:
             logger.error(f"API请求未知错误: {e}")
-            return {"success": False, "message": f"API请求未知错误: {e}"}
+            result = {"success": False, "message": f"API请求未知错误: {e}"}
+        self.metrics.observe_http(
+            name, time.perf_counter() - start, status, request_bytes, response_bytes,
+            error=result.get("success") is not True,
+        )
+        return result, transient
+
+    @staticmethod
+    def _payload_size(kwargs: Dict) -> int:
+        data = kwargs.get("data")
+        if isinstance(data, (bytes, str)):
+            return len(data)
+        if kwargs.get("json") is not None:
+            return len(json.dumps(kwargs["json"], ensure_ascii=False).encode("utf-8"))
+        return 0
+
+    async def _send_hedged(self, method: str, name: str, url: str, params: Dict, kwargs: Dict) -> Tuple[Dict, bool]:
+        """对冲请求：第一个请求超过 hedge_delay 未返回时再发一个，取先成功的结果"""
+        first = asyncio.create_task(self._send(method, name, url, params, kwargs))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_delay)
+        if done:
+            return first.result()
+        second = asyncio.create_task(self._send(method, name, url, params, kwargs))
+        pending = {first, second}
+        result = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            result = done.pop().result()
+            if not result[1]:
+                break
+        for task in pending:
+            task.cancel()
+        return result
 
-    async def request_text(self, method: str, endpoint: str, **kwargs) -> Dict:
+    async def stream_text(self, method: str, endpoint: str, read_timeout: float = 300,
+                          chunk_size: int = 4096, **kwargs) -> AsyncIterator[str]:
+        """分块读取响应文本，不限制总耗时，仅限制两次数据之间的最大间隔"""
         params = kwargs.pop('params', {})
         if self.Token:
             params['token'] = self.Token
         url = self.base_url + endpoint.lstrip('/')
+        timeout = aiohttp.ClientTimeout(total=None, connect=self.timeout.connect, sock_read=read_timeout)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        if not self.breaker.allow():
+            raise APIConnectionError("quark-auto-save 暂时不可用，请稍后再试")
+        name = endpoint.strip('/')
+        start = time.perf_counter()
+        status, response_bytes = "error", 0
+        session = self._get_session()
+        settled = False
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                headers = {'Content-Type': 'application/json'}
-                async with session.request(method, url, params=params, headers=headers, **kwargs) as response:
-                    return await response.text()
-        except aiohttp.ClientResponseError as e:
-            logger.error(f"API响应错误: {e}")
-            return None
-        
+            try:
+                response = await session.request(method, url, params=params, timeout=timeout, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                settled = True
+                self.breaker.record_failure()
+                raise
+            async with response:
+                status = str(response.status)
+                settled = True
+                if response.status >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    response_bytes += len(chunk)
+                    text = decoder.decode(chunk)
+                    if text:
+                        yield text
+                text = decoder.decode(b"", final=True)
+                if text:
+                    yield text
+        finally:
+            # 取消或其他异常导致没有结果时释放探测名额
+            if not settled:
+                self.breaker.release()
+            self.metrics.observe_http(
+                name, time.perf_counter() - start, status, response_bytes=response_bytes,
+                error=not status.startswith("2"),
+            )
+
 class QuarkConfigManager:
-    def __init__(self, http_client: HttpClient):
+    def __init__(self, http_client: HttpClient, write_delay: float = 1.0, conflict_check: bool = True,
+                 conflict_window: float = 30, snapshot_path: Optional[str] = None):
         self.http = http_client
-        self._config: Optional[Dict] = None
-    
-    async def load(self):
-        """加载配置"""
+        self.snapshot_path = snapshot_path
+        self._settings: Optional[str] = None  # 除任务列表外的全局配置，序列化后保存，从快照加载时为 None
+        self._tasks: Optional[List[TaskRecord]] = None
+        self._share_index: Dict[str, int] = {}  # 分享ID -> 任务索引
+        self._name_index: Dict[str, int] = {}  # 任务名 -> 任务索引
+        self._savepath_index: Dict[str, int] = {}  # 保存路径 -> 任务索引
+        self._id_index: Dict[str, int] = {}  # 稳定任务ID -> 任务索引
+        self._mutation_lock = asyncio.Lock()
+        self.write_delay = max(0.0, float(write_delay or 0))
+        self.conflict_check = conflict_check
+        # 距最近一次与服务端同步不超过该秒数时，写入前不再检查冲突
+        self.conflict_window = max(0.0, float(conflict_window or 0))
+        self._version: Optional[str] = None  # 最近一次与服务端同步的配置指纹
+        self._synced_tasks: Optional[List[TaskRecord]] = None  # 与 _version 对应的任务列表，写入失败时据此回滚
+        self._synced_at = 0.0  # 最近一次成功读取或写入服务端配置的时间
+        self._pending: List[Tuple] = []  # 尚未写入服务端的修改
+        self._flush_future: Optional[asyncio.Future] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+        self._sync_task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._snapshot_version: Optional[str] = None
+
+    @staticmethod
+    def _dump(config: Dict) -> str:
+        """写入服务端的请求体，保持配置原有的键顺序，避免改动 Web 后台配置文件的排版"""
+        return json.dumps(config, ensure_ascii=False)
+
+    @staticmethod
+    def _fingerprint(body: str) -> str:
+        """配置指纹，直接对请求体计算，避免再次序列化整份配置。
+        服务端按写入时的键顺序保存配置，未变化的配置指纹一致；键顺序被改动时只会多合并一次"""
+        return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+    async def _fetch(self) -> Optional[Dict]:
+        """从服务端获取配置"""
         try:
             response = await self.http.request('GET', 'data')
             if response.get("success") is True:
-                self._config = response.get("data", {})
-            else:
-                logger.error(f"加载配置失败: {response.get('message', '未登录或Token错误')}")
-                self._config = None
+                return response.get("data", {})
+            logger.error(f"加载配置失败: {response.get('message', '未登录或Token错误')}")
         except APIResponseError as e:
             logger.error(f"加载配置失败: {e}")
-            self._config = None
+        return None
+
+    async def load(self) -> bool:
+        """加载配置，尚未写入的本地修改会重新应用到新配置上，加载失败时保留当前配置"""
+        config = await self._fetch()
+        if config is None:
+            return False
+        self._synced_at = time.monotonic()
+        self._set_remote(config)
+        await self._save_snapshot()
+        return True
+
+    def _set_remote(self, config: Dict, version: Optional[str] = None):
+        version = version or self._fingerprint(self._dump(config))
+        if version == self._version and self._tasks is not None and not self._pending:
+            return  # 配置未变化，无需重建索引
+        # 全局配置只在写入时使用，任务转换为紧凑记录，原始字典随后即可释放
+        # 任务列表位置保留为占位，还原时原样放回，保持各项配置的顺序
+        self._settings = json_dumps_compact({
+            key: None if key == "tasklist" else value for key, value in config.items()
+        })
+        self._tasks = [TaskRecord.from_dict(task) for task in config.get("tasklist") or []]
+        self._version = version
+        self._synced_tasks = self._tasks
+        self.rebuild_index()
+        self._replay(self._pending)
+
+    def load_snapshot(self) -> bool:
+        """从本地快照加载配置"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                config = json_loads(f.read())
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取配置快照失败: {e}")
+            return False
+        tasklist = config.get("tasklist") if isinstance(config, dict) else None
+        if not isinstance(tasklist, list):
+            logger.warning("配置快照格式错误")
+            return False
+        self._set_remote({"tasklist": tasklist})
+        # 快照不含全局配置，写入前必须先从服务端获取完整配置
+        self._settings = None
+        self._version = None
+        self._snapshot_version = None
+        return True
+
+    async def _save_snapshot(self):
+        """将最近一次同步的配置保存到本地快照"""
+        if not self.snapshot_path or self._tasks is None or self._snapshot_version == self._version:
+            return
+        # 快照只保存任务列表，Cookie、推送和插件配置中的密钥等全局配置不落盘
+        body = json.dumps({"tasklist": [task.to_dict() for task in self._tasks]}, ensure_ascii=False)
+        try:
+            await asyncio.to_thread(self._write_file, self.snapshot_path, body)
+            self._snapshot_version = self._version
+        except OSError as e:
+            logger.warning(f"保存配置快照失败: {e}")
+
+    @staticmethod
+    def _write_file(path: str, body: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
 
-    async def update(self):
-        """更新配置"""
-        response = await self.http.request('POST', 'update', json=self._config)
+    async def refresh(self) -> bool:
+        """从服务端刷新配置，与写入操作互斥"""
+        async with self._write_lock:
+            return await self.load()
+
+    def refresh_later(self):
+        """在后台刷新一次配置，不受定时同步是否开启的影响"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_once())
+
+    async def _refresh_once(self):
+        try:
+            if not await self.refresh():
+                logger.warning("刷新配置失败，继续使用本地快照")
+        except Exception as e:
+            logger.warning(f"刷新配置失败: {e}")
+
+    def start_sync(self, interval: float):
+        """启动后台定时同步"""
+        if interval <= 0 or (self._sync_task and not self._sync_task.done()):
+            return
+        self._sync_task = asyncio.create_task(self._sync_loop(interval))
+
+    async def stop_sync(self):
+        """停止后台定时同步与尚未完成的后台刷新"""
+        for task in (self._sync_task, self._refresh_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._sync_task = None
+        self._refresh_task = None
+
+    async def _sync_loop(self, interval: float):
+        delay = interval
+        failures = 0
+        while True:
+            # 加入随机抖动，避免多个实例同时请求
+            await asyncio.sleep(delay * random.uniform(0.9, 1.1))
+            try:
+                ok = await self.refresh()
+            except Exception as e:
+                logger.warning(f"同步配置失败: {e}")
+                ok = False
+            if ok:
+                failures = 0
+                delay = interval
+            else:
+                # 失败时指数退避，最长为同步间隔的8倍
+                failures += 1
+                delay = min(interval * 8, min(interval, 30) * 2 ** (failures - 1))
+
+    async def update(self) -> bool:
+        """将本地修改写入服务端"""
+        if self._tasks is None:
+            logger.error("配置未初始化")
+            return False
+        ops, self._pending = self._pending, []
+        # 从快照启动时还没有全局配置，必须先获取服务端配置
+        if self._settings is None or (self.conflict_check and self._version and not self._recently_synced()):
+            remote = await self._fetch()
+            if remote is None:
+                # 无法确认服务端配置时不写入，与写入失败一样丢弃本次修改，保证回复与服务端一致
+                self._rollback()
+                return False
+            self._synced_at = time.monotonic()
+            remote_version = self._fingerprint(self._dump(remote))
+            if remote_version != self._version:
+                # 配置已在 Web 后台被修改，以服务端为准重新应用本地修改
+                if self._version:
+                    logger.warning("检测到配置已被其他客户端修改，正在合并本地修改")
+                self._pending = ops + self._pending
+                self._set_remote(remote, remote_version)
+                ops, self._pending = self._pending, []
+        tasks = self._tasks
+        body = self._dump(self._materialize())
+        response = await self.http.request('POST', 'update', data=body.encode("utf-8"))
         if response.get("success") is True:
-            await self.load()  # 刷新配置
-        else:
-            logger.error(f"更新配置失败: {response.get('message', '未知登录或Token错误')}")
-            self._config = None
+            self._version = self._fingerprint(body)
+            self._synced_tasks = tasks
+            self._synced_at = time.monotonic()
+            await self._save_snapshot()
+            return True
+        logger.error(f"更新配置失败: {response.get('message', '未知登录或Token错误')}")
+        # 写入失败时丢弃本次修改：先回滚到最近一次同步的任务列表，再与服务端同步，同步失败时保留回滚结果
+        self._rollback()
+        await self.load()
+        return False
+
+    def _recently_synced(self) -> bool:
+        return time.monotonic() - self._synced_at < self.conflict_window
+
+    def _rollback(self):
+        """恢复到最近一次同步的任务列表，写入期间新增的修改重新应用"""
+        self._tasks = self._synced_tasks
+        self.rebuild_index()
+        self._replay(self._pending)
+
+    async def commit(self) -> bool:
+        """提交本地修改，写入延迟内的多次提交会合并为一次写入"""
+        if self._flush_future is None or self._flush_future.done():
+            self._flush_future = asyncio.get_running_loop().create_future()
+            self._flush_task = asyncio.create_task(self._delayed_flush(self._flush_future))
+        return await asyncio.shield(self._flush_future)
+
+    async def _delayed_flush(self, future: asyncio.Future):
+        await asyncio.sleep(self.write_delay)
+        async with self._write_lock:
+            # 进入写入后的新修改由下一次提交负责
+            if self._flush_future is future:
+                self._flush_future = None
+            try:
+                result = await self.update()
+            except Exception as e:
+                logger.error(f"更新配置失败: {e}")
+                result = False
+        if not future.done():
+            future.set_result(result)
+
+    def _materialize(self) -> Dict:
+        """还原完整配置，仅在写入服务端或保存快照时使用"""
+        config = json_loads(self._settings) if self._settings is not None else {}
+        config["tasklist"] = [task.to_dict() for task in self._tasks]
+        return config
+
+    @property
+    def loaded(self) -> bool:
+        """配置是否已加载"""
+        return self._tasks is not None
 
     @property
     def config(self) -> Dict:
-        """获取配置"""
-        if not self._config:
+        """获取完整配置，每次调用都会重新构建"""
+        if self._tasks is None:
             logger.error("配置未初始化")
             return {}
-        return self._config
+        return self._materialize()
     
     @property
-    def task(self) -> List[Dict]:
+    def task(self) -> List[TaskRecord]:
         """获取任务列表"""
-        return self._config.get("tasklist", [])
+        if self._tasks is None:
+            return []
+        return self._tasks
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """修改锁，查找任务与修改任务需在同一临界区内完成"""
+        return self._mutation_lock
+
+    def add_task(self, task: Dict):
+        """在本地追加任务，需调用 commit 写入服务端"""
+        self.add_tasks([task])
+
+    def add_tasks(self, tasks: List[Dict]):
+        """在本地批量追加任务，只复制一次任务列表，需调用 commit 写入服务端"""
+        ops = [("add", task) for task in tasks]
+        self._commit_ops(ops)
+        self._pending.extend(ops)
+
+    def remove_task(self, task_id: str) -> Optional[Dict]:
+        """在本地删除任务，需调用 commit 写入服务端"""
+        index = self.find_by_task_id(task_id)
+        if index is None:
+            return None
+        task = self.task[index]
+        # 修改记录使用规范ID，传入完整分享ID时也能在重放时找到任务
+        op = ("delete", self.task_id_of(index))
+        if not self._commit_ops([op]):
+            return None
+        self._pending.append(op)
+        return task
+
+    def replace_task(self, task_id: str, task: Dict) -> Optional[str]:
+        """在本地替换任务，返回替换后的任务ID，需调用 commit 写入服务端"""
+        index = self.find_by_task_id(task_id)
+        if index is None:
+            return None
+        op = ("update", self.task_id_of(index), task)
+        if not self._commit_ops([op]):
+            return None
+        self._pending.append(op)
+        return self.task_id_of(index)
+
+    def _commit_ops(self, ops: List[Tuple]) -> int:
+        """写时复制：在任务列表副本上应用修改后整体替换，已取得旧列表的读者不受影响，返回实际生效的修改数"""
+        if self._tasks is None:
+            return 0
+        tasklist = list(self._tasks)
+        applied = sum(self._apply(op, tasklist) for op in ops)
+        self._tasks = tasklist
+        return applied
+
+    def _apply(self, op: Tuple, tasklist: List[TaskRecord]) -> bool:
+        """将一次修改应用到任务列表副本，返回是否生效"""
+        kind = op[0]
+        if kind == "add":
+            task = TaskRecord.from_dict(op[1])
+            if task.share_id in self._share_index:
+                return False
+            tasklist.append(task)
+            self._index_task(task, len(tasklist) - 1)
+            return True
+        index = self.find_by_task_id(op[1])
+        if index is None:
+            return False
+        if kind == "delete":
+            task = tasklist.pop(index)
+            self.index_remove(task, index)
+        elif kind == "update":
+            old_task = tasklist[index]
+            tasklist[index] = TaskRecord.from_dict(op[2])
+            self.index_update(old_task, tasklist[index], index)
+        return True
+
+    def _replay(self, ops: List[Tuple]):
+        if ops:
+            self._commit_ops(ops)
+
+    def rebuild_index(self):
+        """根据当前任务列表重建索引"""
+        self._share_index = {}
+        self._name_index = {}
+        self._savepath_index = {}
+        self._id_index = {}
+        for index, task in enumerate(self.task):
+            self._index_task(task, index)
+
+    def _index_task(self, task: TaskRecord, index: int):
+        share_id = task.share_id
+        if share_id:
+            self._share_index[share_id] = index
+        if task.get("taskname"):
+            self._name_index[task["taskname"]] = index
+        if task.get("savepath"):
+            self._savepath_index[task["savepath"]] = index
+        short_id, full_id = make_task_id(task)
+        # 短ID冲突时使用完整ID
+        if self._id_index.get(short_id, index) == index:
+            self._id_index[short_id] = index
+        else:
+            self._id_index[full_id] = index
+
+    def _unindex_task(self, task: TaskRecord, index: int):
+        share_id = task.share_id
+        if share_id and self._share_index.get(share_id) == index:
+            del self._share_index[share_id]
+        if self._name_index.get(task.get("taskname")) == index:
+            del self._name_index[task["taskname"]]
+        if self._savepath_index.get(task.get("savepath")) == index:
+            del self._savepath_index[task["savepath"]]
+        for task_id in make_task_id(task):
+            if self._id_index.get(task_id) == index:
+                del self._id_index[task_id]
+
+    def index_remove(self, task: TaskRecord, index: int):
+        """任务从列表中删除后更新索引，后续任务的索引前移一位"""
+        self._unindex_task(task, index)
+        for table in (self._share_index, self._name_index, self._savepath_index, self._id_index):
+            for key, value in table.items():
+                if value > index:
+                    table[key] = value - 1
+
+    def index_update(self, old_task: TaskRecord, task: TaskRecord, index: int):
+        """任务内容修改后更新索引"""
+        self._unindex_task(old_task, index)
+        self._index_task(task, index)
+
+    def task_id_of(self, index: int) -> str:
+        """获取任务的稳定ID"""
+        short_id, full_id = make_task_id(self.task[index])
+        return short_id if self._id_index.get(short_id) == index else full_id
+
+    def find_by_task_id(self, task_id: str) -> Optional[int]:
+        """根据稳定ID查找任务索引，也可使用完整ID或完整的分享ID"""
+        index = self._id_index.get(task_id)
+        if index is None:
+            index = self._share_index.get(task_id)
+        if index is None and len(task_id) > TASK_ID_LENGTH:
+            # 短ID只在其他实例中冲突时，展示的是完整ID，而索引中只有短ID
+            index = self._id_index.get(task_id[:TASK_ID_LENGTH])
+            if index is not None and make_task_id(self.task[index])[1] != task_id:
+                index = None
+        return index
+
+    def find_by_share_id(self, share_id: str) -> Optional[int]:
+        """根据分享ID查找任务索引"""
+        return self._share_index.get(share_id)
+
+    def find_by_name(self, taskname: str) -> Optional[int]:
+        """根据任务名查找任务索引"""
+        return self._name_index.get(taskname)
+
+    def find_by_savepath(self, savepath: str) -> Optional[int]:
+        """根据保存路径查找任务索引"""
+        return self._savepath_index.get(savepath)
 
 class QuarkSaveApi:
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, data_dir: Optional[str] = None):
+        self.data_dir = data_dir
         self._init_settings(config)
-        self.http = HttpClient(
-            config["quark_auto_save_url"],
-            config["quark_auto_save_token"]
+        self.metrics = Metrics()
+        endpoints = [(config["quark_auto_save_url"], config["quark_auto_save_token"])]
+        endpoints += parse_backends(config.get("quark_auto_save_backends", []))
+        self.backends: List[Backend] = []
+        for number, (url, token) in enumerate(endpoints):
+            http = HttpClient(
+                url,
+                token,
+                pool_size=config.get("http_pool_size", 10),
+                timeout=config.get("http_timeout", 10),
+                connect_timeout=config.get("http_connect_timeout", 5),
+                retries=config.get("http_retries", 2),
+                retry_backoff=config.get("http_retry_backoff", 0.5),
+                hedge_delay=config.get("http_hedge_delay", 0),
+                endpoint_timeouts=parse_endpoint_timeouts(config.get("http_endpoint_timeouts", "get_share_detail=20")),
+                breaker=CircuitBreaker(
+                    failure_threshold=config.get("circuit_failure_threshold", 5),
+                    reset_timeout=config.get("circuit_reset_timeout", 30),
+                ),
+                metrics=self.metrics,
+            )
+            snapshot_name = "config_snapshot.json" if number == 0 else f"config_snapshot_{number}.json"
+            config_manager = QuarkConfigManager(
+                http,
+                write_delay=config.get("config_write_delay", 1.0),
+                conflict_check=config.get("config_conflict_check", True),
+                conflict_window=config.get("config_conflict_window", 30),
+                snapshot_path=os.path.join(data_dir, snapshot_name) if data_dir else None,
+            )
+            self.backends.append(Backend(number, http, config_manager))
+        # 主实例，单实例部署时与原有行为一致
+        self.http = self.backends[0].http
+        self.config_manager = self.backends[0].config_manager
+        policy = config.get("backend_policy", "least_tasks")
+        if policy not in ROUTING_POLICIES:
+            logger.warning(f"未知的实例选择策略 {policy}，使用 least_tasks")
+            policy = "least_tasks"
+        self.policy = ROUTING_POLICIES[policy]()
+        metrics_file = config.get("metrics_file", "")
+        if metrics_file and data_dir and not os.path.isabs(metrics_file):
+            metrics_file = os.path.join(data_dir, metrics_file)
+        self.metrics_exporter = MetricsExporter(
+            self.metrics,
+            path=metrics_file or None,
+            port=config.get("metrics_port", 0),
+            interval=config.get("metrics_export_interval", 60),
+        )
+        self.share_cache = ShareDetailCache(
+            maxsize=config.get("share_cache_size", 512),
+            ttl=config.get("share_cache_ttl", 600),
+            negative_ttl=config.get("share_cache_negative_ttl", 60),
+        )
+        self.ingest = IngestQueue(
+            self.ingest_shares,
+            maxsize=config.get("ingest_queue_size", 100),
+            workers=config.get("ingest_workers", 4),
+            batch_size=config.get("ingest_batch_size", 30),
+            user_rate=config.get("ingest_user_rate", 30),
+            user_burst=config.get("ingest_user_burst", 30),
+            metrics=self.metrics,
         )
-        self.config_manager = QuarkConfigManager(self.http)
+        self.watcher = ShareWatcher(
+            self.backends,
+            # 定时检查的结果只用于比较指纹，不经过缓存，避免挤掉用户查询的缓存条目
+            lambda shareurl: self.get_share_detail(shareurl, None, cache=False),
+            self._run_stream,
+            path=os.path.join(data_dir, "share_fingerprints.json") if data_dir else None,
+            interval=config.get("share_watch_interval", 0),
+            concurrency=config.get("share_watch_concurrency", 3),
+        )
+        self._check_task: Optional[asyncio.Task] = None
 
     def _init_settings(self, config: dict):
         """初始化设置"""
         self.save_path = config.get("quark_save_path", "")
         if self.save_path and self.save_path[0] != "/":
             self.save_path = "/" + self.save_path
+        self.detail_concurrency = max(1, int(config.get("share_detail_concurrency", 5) or 5))
+        # 识别队列的各工作协程与批量导入共用同一并发限制
+        self._detail_semaphore = asyncio.Semaphore(self.detail_concurrency)
+        self.import_chunk_size = max(1, int(config.get("import_chunk_size", 200) or 200))
+        self.list_page_size = max(1, int(config.get("list_page_size", 50) or 50))
+        self.message_max_bytes = max(200, int(config.get("message_max_bytes", 4000) or 4000))
+        self.sync_interval = float(config.get("config_sync_interval", 300) or 0)
+        self.run_read_timeout = float(config.get("run_read_timeout", 300) or 300)
+        self.jobs = RunJobManager(progress_interval=config.get("run_progress_interval", 10))
 
     async def initialize(self):
-        """初始化连接"""
-        await self._check_connection()
-        await self.config_manager.load()
+        """初始化所有实例，优先使用本地快照，随后在后台与服务端同步"""
+        await asyncio.gather(*(self._init_backend(backend) for backend in self.backends))
+        await self.metrics_exporter.start()
+        self.ingest.start()
+        self.watcher.load()
+        self.watcher.start()
 
-    async def _check_connection(self):
-        """检查基础连接"""
-        try:
-            await self.http.request('GET', 'data')
-        except APIConnectionError as e:
-            logger.error(f"连接quark-auto-save失败: {e}")
-            return False
+    async def _init_backend(self, backend: Backend):
+        config_manager = backend.config_manager
+        from_snapshot = config_manager.load_snapshot()
+        if from_snapshot:
+            # 快照可能已过期，在后台从服务端刷新，关闭定时同步时同样需要
+            logger.info(f"已从本地快照加载quark-auto-save配置: {backend.name}")
+            config_manager.refresh_later()
+        elif not await config_manager.refresh():
+            logger.error(f"连接quark-auto-save失败，请检查URL和API Token: {backend.name}")
+        config_manager.start_sync(self.sync_interval)
+
+    async def close(self):
+        """停止后台同步与指标导出、取消后台任务并关闭HTTP连接池"""
+        await self.metrics_exporter.close()
+        await self.ingest.close()
+        await self.watcher.close()
+        if self._check_task and not self._check_task.done():
+            self._check_task.cancel()
+            await asyncio.gather(self._check_task, return_exceptions=True)
+        await asyncio.gather(*(backend.config_manager.stop_sync() for backend in self.backends))
+        await self.jobs.close()
+        await asyncio.gather(*(backend.http.close() for backend in self.backends))
+
+    def _candidates(self) -> List[Backend]:
+        """已加载配置的实例，都未加载时返回全部实例"""
+        return [backend for backend in self.backends if backend.available] or self.backends
+
+    def _route(self, share_id: Optional[str]) -> Backend:
+        """为新分享选择实例，只在已加载配置的实例中选择，每个新任务只调用一次"""
+        candidates = self._candidates()
+        if len(candidates) == 1:
+            return candidates[0]
+        return self.policy.choose(candidates, share_id)
+
+    def _resolve(self, task_id: str) -> Optional[Tuple[Backend, int]]:
+        """将稳定任务ID解析为实例和实例内索引，ID在多个实例中都存在时不做选择"""
+        if not task_id:
+            return None
+        task_id = str(task_id).lower()
+        found = None
+        for backend in self.backends:
+            index = backend.config_manager.find_by_task_id(task_id)
+            if index is not None:
+                if found is not None:
+                    logger.warning(f"任务ID {task_id} 在多个实例中存在，请使用完整ID")
+                    return None
+                found = backend, index
+        return found
+
+    def _task_id(self, backend: Backend, index: int) -> str:
+        """获取所有实例中唯一的任务ID，短ID与其他实例的任务冲突时使用完整ID"""
+        config_manager = backend.config_manager
+        task_id = config_manager.task_id_of(index)
+        if len(self.backends) > 1 and len(task_id) == TASK_ID_LENGTH and any(
+            other is not backend and other.config_manager.find_by_task_id(task_id) is not None
+            for other in self.backends
+        ):
+            return make_task_id(config_manager.task[index])[1]
+        return task_id
+
+    def _find_share(self, share_id: str) -> Optional[Tuple[Backend, int]]:
+        for backend in self.backends:
+            index = backend.config_manager.find_by_share_id(share_id)
+            if index is not None:
+                return backend, index
+        return None
 
     def build_share_url(self, base_url: str, pwd: Optional[str]) -> str:
         """构建完整分享链接"""
         return f"{base_url}?pwd={pwd}" if pwd else base_url
 
-    async def get_share_detail(self, quark_share_link, pwd):
-        """获取分享链接详情"""
+    async def get_share_detail(self, quark_share_link, pwd, cache: bool = True):
+        """获取分享链接详情，结果按分享ID和提取码缓存，cache 为 False 时直接请求，不读取也不写入缓存"""
         url = self.build_share_url(quark_share_link, pwd)
-        return await self.http.request('POST', 'get_share_detail', json={'shareurl': url})
+        share_id = extract_share_id(quark_share_link)
+        key = (share_id or quark_share_link, pwd or "")
+        # 已有任务的分享通过所在实例获取，新分享使用第一个可用实例获取，
+        # 不经过实例选择策略，避免轮询等有状态的策略被查询详情额外推进
+        found = self._find_share(share_id) if share_id else None
+        http = (found[0] if found else self._candidates()[0]).http
+        if not cache:
+            return await http.request('POST', 'get_share_detail', json={'shareurl': url})
+        return await self.share_cache.get_or_fetch(
+            key, lambda: http.request('POST', 'get_share_detail', json={'shareurl': url})
+        )
+
+    async def get_share_details(self, links: List[Tuple[str, Optional[str]]]) -> List[Dict]:
+        """并发获取多个分享链接详情，并发数受 share_detail_concurrency 限制"""
+        async def fetch(link: str, pwd: Optional[str]) -> Dict:
+            async with self._detail_semaphore:
+                return await self.get_share_detail(link, pwd)
+
+        return await asyncio.gather(*(fetch(link, pwd) for link, pwd in links))
         
+    # 处理识别到的分享链接
+    async def ingest_shares(self, items: List[Tuple[str, Optional[str]]]) -> List[Dict]:
+        """获取一批分享链接的详情并合并添加任务，由识别队列的工作协程调用，按顺序返回结果"""
+        results: List[Optional[Dict]] = [None] * len(items)
+        pending = []
+        for position, (share_link, pwd) in enumerate(items):
+            if self.task_exists(share_link):
+                results[position] = {"success": False, "message": "该链接已经存在"}
+            else:
+                pending.append(position)
+        details = await self.get_share_details([items[position] for position in pending])
+        titled = []
+        for position, share_detail in zip(pending, details):
+            if share_detail.get("success") is not True:
+                message = share_detail.get("message") or (share_detail.get("data") or {}).get("error")
+                results[position] = {"success": False, "message": message or "获取分享详情失败"}
+            else:
+                # 去除标题中的.和空格
+                title = share_detail["data"]["share"]["title"].replace(".", "").replace(" ", "")
+                titled.append((position, title))
+        if titled:
+            resp = await self.add_share_tasks([items[position] + (title,) for position, title in titled])
+            added = set(resp["data"]["added"])
+            skipped = set(resp["data"]["skipped"])
+            for position, title in titled:
+                if title in added:
+                    message = "添加任务成功"
+                elif title in skipped:
+                    message = "分享链接已存在"
+                else:
+                    message = resp["message"]
+                results[position] = {"success": title in added, "message": f"任务 {title} {message}", "data": {"title": title}}
+        return results
+
+    async def ingest_links(self, user: str, links: Dict[str, Optional[str]]) -> List[Tuple[str, Dict]]:
+        """将分享链接加入识别队列并等待处理结果，按用户限速，队列已满或处理中的链接直接返回"""
+        submitted = []
+        limited = []
+        results: Dict[str, Dict] = {}
+        for share_link, pwd in links.items():
+            if self.task_exists(share_link):
+                results[share_link] = {"success": False, "message": "该链接已经存在"}
+                continue
+            status, value = self.ingest.submit(user, extract_share_id(share_link) or share_link, (share_link, pwd))
+            if status == "queued":
+                submitted.append((share_link, value))
+            elif status == "duplicate":
+                results[share_link] = {"success": False, "message": "该链接正在处理中"}
+            elif status == "rate_limited":
+                limited.append(share_link)
+            else:
+                results[share_link] = {"success": False, "message": "处理队列已满，请稍后重试"}
+        if limited:
+            # 按所有被限速的链接计算等待时间，而不是只够再提交一个链接的时间
+            wait = math.ceil(self.ingest.retry_after(user, len(limited)))
+            for share_link in limited:
+                results[share_link] = {"success": False, "message": f"提交过于频繁，请 {wait} 秒后重试"}
+        outcomes = await asyncio.gather(*(future for _, future in submitted), return_exceptions=True)
+        for (share_link, _), outcome in zip(submitted, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                results[share_link] = {"success": False, "message": "插件已停止，未处理"}
+            elif isinstance(outcome, BaseException):
+                results[share_link] = {"success": False, "message": f"处理失败: {outcome}"}
+            else:
+                results[share_link] = outcome
+        return [(share_link, results[share_link]) for share_link in links]
+
     # 检查链接是否已经存在
     def task_exists(self, share_link: str) -> bool:
-        """检查任务是否存在"""
-        pattern = r"/s/([a-f0-9]+)(?:[?#]|$)"  # 匹配分享链接的正则表达式
-        share_link = re.search(pattern, share_link).group(1)
-        for task in self.config_manager.task:
-            if re.search(pattern, task["shareurl"]).group(1) == share_link:
-                return True
-        return False
+        """检查任务是否存在于任一实例"""
+        share_id = extract_share_id(share_link)
+        if not share_id:
+            return False
+        return self._find_share(share_id) is not None
 
-    # 添加分享任务
-    async def add_share_task(self, share_link: str, pwd: Optional[str], title: str):
-        share_link = self.build_share_url(share_link, pwd)
-        save_path = os.path.join(self.save_path, title)
-        payload = {
-            "shareurl": share_link,
-            "savepath": save_path,
+    def _build_task(self, share_link: str, pwd: Optional[str], title: str) -> Dict:
+        """构建新任务"""
+        return {
+            "shareurl": self.build_share_url(share_link, pwd),
+            "savepath": os.path.join(self.save_path, title),
             "taskname": title,
             "pattern": "(.*)\\.(mp4|mkv)",
             "replace": "",
         }
-        if self.task_exists(share_link):
-            return {"success": False, "message": "分享链接已存在"}
+
+    # 添加分享任务
+    async def add_share_task(self, share_link: str, pwd: Optional[str], title: str):
+        resp = await self.add_share_tasks([(share_link, pwd, title)])
+        return {"success": resp["success"], "message": resp["message"]}
+
+    # 批量添加分享任务
+    async def add_share_tasks(self, items: List[Tuple[str, Optional[str], str]]):
+        """批量添加任务，按实例分组，每个实例的新任务通过一次配置更新提交"""
+        if not any(backend.available for backend in self.backends):
+            return {"success": False, "message": "配置未初始化", "data": {"added": [], "skipped": []}}
+        tasks, skipped = [], []
+        for share_link, pwd, title in items:
+            task = self._build_task(share_link, pwd, title)
+            if self.task_exists(task["shareurl"]):
+                skipped.append(title)
+            else:
+                tasks.append(task)
+        if not tasks:
+            return {"success": False, "message": "分享链接已存在", "data": {"added": [], "skipped": skipped}}
+        added = [task["taskname"] for task in await self._add_tasks(tasks)]
+        if not added:
+            return {"success": False, "message": "添加任务失败", "data": {"added": [], "skipped": skipped}}
+        return {"success": True, "message": "添加任务成功", "data": {"added": added, "skipped": skipped}}
+
+    async def _add_tasks(self, tasks: List[Dict]) -> List[Dict]:
+        """将新任务分配到各实例，每个实例写入一次，返回写入成功的任务"""
+        groups: Dict[int, List[Dict]] = {}
+        for task in tasks:
+            backend = self._route(extract_share_id(task["shareurl"]))
+            groups.setdefault(backend.number, []).append(task)
+            # 计入待加入的任务数，使按任务数选择实例的策略能看到分配结果
+            backend.reserved += 1
+        for number, group in groups.items():
+            self.backends[number].reserved = 0
+            self.backends[number].config_manager.add_tasks(group)
+        numbers = list(groups)
+        results = await asyncio.gather(*(self.backends[number].config_manager.commit() for number in numbers))
+        return [task for number, ok in zip(numbers, results) if ok for task in groups[number]]
+
+    def _share_exists(self, share_id: str) -> bool:
+        return self._find_share(share_id) is not None
+
+    # 批量导入任务
+    async def import_tasks(self, path: str):
+        """从 JSONL/CSV 文件流式导入任务，按块解析标题并提交，每块每个实例只写入一次"""
+        if not os.path.isfile(path):
+            return {"success": False, "message": f"文件不存在: {path}"}
+        if not any(backend.available for backend in self.backends):
+            return {"success": False, "message": "配置未初始化"}
+        stats = {"invalid": 0, "duplicate": 0, "added": 0, "failed": 0}
+        chunks = chunked(validate_records(iter_records(path), extract_share_id, stats), self.import_chunk_size)
+        seen: Set[str] = set()
+        while True:
+            # 文件读取与校验在线程中进行，避免阻塞事件循环
+            try:
+                chunk = await asyncio.to_thread(next, chunks, None)
+            except (OSError, UnicodeDecodeError, csv.Error) as e:
+                logger.error(f"读取导入文件失败: {e}")
+                return {"success": False, "message": f"读取导入文件失败: {e}"}
+            if chunk is None:
+                break
+            # 去重需要读取各实例的索引，在事件循环中进行，避免与修改索引的协程并发
+            chunk = list(dedupe_records(chunk, self._share_exists, stats, seen))
+            if not chunk:
+                continue
+            untitled = [record for record in chunk if not record.get("taskname")]
+            details = await self.get_share_details([(record["shareurl"], None) for record in untitled])
+            for record, detail in zip(untitled, details):
+                if detail.get("success") is True:
+                    record["taskname"] = detail["data"]["share"]["title"].replace(".", "").replace(" ", "")
+            tasks = []
+            for record in chunk:
+                if not record.get("taskname"):
+                    stats["failed"] += 1
+                    continue
+                tasks.append({
+                    "shareurl": record["shareurl"],
+                    "savepath": record.get("savepath") or os.path.join(self.save_path, record["taskname"]),
+                    "taskname": record["taskname"],
+                    "pattern": record.get("pattern", "(.*)\\.(mp4|mkv)"),
+                    "replace": record.get("replace", ""),
+                    **({"update_subdir": record["update_subdir"]} if record.get("update_subdir") else {}),
+                })
+            if tasks:
+                added = len(await self._add_tasks(tasks))
+                stats["added"] += added
+                stats["failed"] += len(tasks) - added
+        return {
+            "success": True,
+            "message": (
+                f"导入完成：新增 {stats['added']} 个，重复 {stats['duplicate']} 个，"
+                f"无效 {stats['invalid']} 个，失败 {stats['failed']} 个"
+            ),
+            "data": stats,
+        }
+
+    # 导出任务
+    async def export_tasks(self, fmt: str = "jsonl"):
+        """将所有实例的任务流式导出到插件数据目录"""
+        fmt = "csv" if fmt == "csv" else "jsonl"
+        path = os.path.join(self.data_dir or ".", "exports", f"tasks_{time.strftime('%Y%m%d_%H%M%S')}.{fmt}")
+        # 任务列表为写时复制，取得的列表不会再被修改，可直接在线程中遍历
+        tasklists = [backend.config_manager.task for backend in self.backends]
         try:
-            response_data = await self.http.request('POST', '/api/add_task', json=payload)
-            if response_data.get("success") is True:
-                await self.config_manager.load() # 刷新配置
-                return {"success": True, "message": "添加任务成功"}
-        except APIResponseError as e:
-            logger.error(f"添加任务失败: {e}")
-            return {"success": False, "message": "添加任务失败"}
+            count = await asyncio.to_thread(write_export, path, itertools.chain(*tasklists), fmt)
+        except OSError as e:
+            logger.error(f"导出任务失败: {e}")
+            return {"success": False, "message": f"导出任务失败: {e}"}
+        return {"success": True, "message": f"已导出 {count} 个任务到 {path}", "data": path}
 
     # 运行任务
-    async def run_task(self, index: Optional[int] = None):
-        """运行指定任务或所有任务"""
-        if index is None:
-            params = {"task_index": ""}
-        else:
-            params = {"task_index": index}
-            if index < 0 or index >= len(self.config_manager.task):
-                return {"success": False, "message": "索引越界，不支持处理"}
-        data = await self.http.request_text('GET', 'run_script_now', params=params)
-        return {"success": True, "message": data}
+    async def run_task(self, task_id: Optional[str], notify: Callable[[str], Awaitable[None]]):
+        """在后台运行指定任务或所有任务，运行所有任务时各实例同时执行，输出通过 notify 分批推送"""
+        multiple = len(self.backends) > 1
+        if task_id is None:
+            jobs = []
+            for backend in self.backends:
+                description = f"运行所有任务 [{backend.name}]" if multiple else "运行所有任务"
+                jobs.append(self._submit_run(backend, {"task_index": ""}, description, notify))
+            ids = "、".join(f"#{job.id}" for job in jobs)
+            return {"success": True, "message": f"已提交任务 {ids}：运行所有任务，执行输出将分批发送", "data": jobs}
+        resolved = self._resolve(task_id)
+        if resolved is None:
+            return {"success": False, "message": "任务不存在"}
+        backend, local_index = resolved
+        description = f"运行任务 {backend.config_manager.task[local_index].get('taskname', task_id)}"
+        job = self._submit_run(backend, {"task_index": local_index}, description, notify)
+        return {"success": True, "message": f"已提交任务 #{job.id}：{description}，执行输出将分批发送", "data": job}
+
+    def _submit_run(self, backend: Backend, params: Dict, description: str,
+                    notify: Callable[[str], Awaitable[None]]):
+        stream = backend.http.stream_text(
+            'GET', 'run_script_now', read_timeout=self.run_read_timeout, params=params
+        )
+        return self.jobs.submit(stream, description, notify)
+
+    def _run_stream(self, backend: Backend, index: int) -> AsyncIterator[str]:
+        """运行实例上的单个任务，供分享检查使用"""
+        return backend.http.stream_text(
+            'GET', 'run_script_now', read_timeout=self.run_read_timeout, params={"task_index": index}
+        )
+
+    # 检查分享变化
+    async def check_shares(self, notify: Callable[[str], Awaitable[None]]):
+        """在后台立即检查一次所有任务的分享，完成后通过 notify 推送结果"""
+        if self.watcher.running or (self._check_task and not self._check_task.done()):
+            return {"success": False, "message": "分享检查正在进行中"}
+
+        async def check():
+            try:
+                result = await self.watcher.check()
+                text = self.format_watch_result(result)
+            except Exception as e:
+                logger.error(f"分享检查失败: {e}")
+                text = f"分享检查失败: {e}"
+            try:
+                await notify(text)
+            except Exception as e:
+                logger.warning(f"发送分享检查结果失败: {e}")
+
+        self._check_task = asyncio.create_task(check())
+        return {"success": True, "message": "已开始检查所有任务的分享，完成后将发送结果"}
+
+    @staticmethod
+    def format_watch_result(result: Dict) -> str:
+        text = (
+            f"分享检查完成，耗时 {result['elapsed']:.0f} 秒\n"
+            f"检查任务: {result['checked']}\n"
+            f"有变化: {result['changed']}，已运行: {result['started']}\n"
+            f"失效: {result['banned']}，获取失败: {result['errors']}"
+        )
+        if result["baseline"]:
+            text += "\n首次检查只记录分享指纹，不运行任务"
+        return text
     
     # 删除指定任务        
-    async def del_task(self, index: int):
-        if 0 <= index < len(self.config_manager.task):
-            del self.config_manager.config["tasklist"][index]
-            await self.config_manager.update()
-            return {"success": True, "message": "删除成功"}
-        else:
-            return {"success": False, "message":"索引越界，不支持处理"}
+    async def del_task(self, task_id: str):
+        resolved = self._resolve(task_id)
+        if resolved is None:
+            return {"success": False, "message": "任务不存在"}
+        backend = resolved[0]
+        async with backend.config_manager.lock:
+            if backend.config_manager.remove_task(str(task_id).lower()) is None:
+                return {"success": False, "message": "任务不存在"}
+        if not await backend.config_manager.commit():
+            return {"success": False, "message": "删除失败"}
+        return {"success": True, "message": "删除成功"}
         
     # 修改指定任务
-    async def rename_task(self, index, name, dir, link, subdir):
-        if index < 0 or index >= len(self.config_manager.task):
-            return {"success": False, "message": "索引越界，不支持处理"}
-        # 复制tasklist，避免直接修改原数据
-        task = self.config_manager.task[index]
-        # 修改任务名称
-        if name:
-            task["taskname"] = name
-            if task["taskname"]:
-                base_path = os.path.dirname(task["savepath"])
-                # 如果任务名称不为空，则使用任务名称作为子目录
-                task["savepath"] = os.path.join(base_path, name)
-        if dir:
-            # 将目录修改为 /dir/taskname
-            task["savepath"] = os.path.join(dir, os.path.basename(task["taskname"]))
-        if link:
-            task["shareurl"] = link
-            del task["shareurl_ban"] # 删除分享链接失效标记
-        if subdir:
-            task["update_subdir"] = subdir # 子目录正则表达式
+    async def rename_task(self, task_id, name, dir, link, subdir):
         if dir is None and link is None and subdir is None and name is None:
             return {"success": False, "message": "没有需要修改的内容"}
-        self.config_manager.config[index] = task
-        await self.config_manager.update()
-        return {"success": True, "message": "修改成功"}
+        resolved = self._resolve(task_id)
+        if resolved is None:
+            return {"success": False, "message": "任务不存在"}
+        backend = resolved[0]
+        config_manager = backend.config_manager
+        task_id = str(task_id).lower()
+        async with config_manager.lock:
+            # 在锁内重新查找，避免期间任务已被删除或移动
+            index = config_manager.find_by_task_id(task_id)
+            if index is None:
+                return {"success": False, "message": "任务不存在"}
+            old_id = config_manager.task_id_of(index)
+            old_global_id = self._task_id(backend, index)
+            # 复制任务，避免直接修改原数据
+            task = config_manager.task[index].to_dict()
+            # 修改任务名称
+            if name:
+                task["taskname"] = name
+                if task["taskname"]:
+                    base_path = os.path.dirname(task["savepath"])
+                    # 如果任务名称不为空，则使用任务名称作为子目录
+                    task["savepath"] = os.path.join(base_path, name)
+            if dir:
+                # 将目录修改为 /dir/taskname
+                task["savepath"] = os.path.join(dir, os.path.basename(task["taskname"]))
+            if link:
+                task["shareurl"] = link
+                task.pop("shareurl_ban", None) # 删除分享链接失效标记
+            if subdir:
+                task["update_subdir"] = subdir # 子目录正则表达式
+            if config_manager.replace_task(old_id, task) is None:
+                return {"success": False, "message": "任务不存在"}
+            new_id = self._task_id(backend, index)
+        if not await config_manager.commit():
+            return {"success": False, "message": "修改失败"}
+        if link and new_id != old_global_id:
+            return {"success": True, "message": f"修改成功，新的任务ID为 {new_id}", "data": new_id}
+        return {"success": True, "message": "修改成功", "data": new_id}
         
     # 获取任务详情
-    async def get_task_detail(self, index):
-        if index < 0 or index >= len(self.config_manager.task):
-            return {"success": False, "message": "索引越界，不支持处理"}
-        task = self.config_manager.task[index]
-        return {"success": True, "message": "success", "data": task}
+    async def get_task_detail(self, task_id):
+        resolved = self._resolve(task_id)
+        if resolved is None:
+            return {"success": False, "message": "任务不存在"}
+        backend, local_index = resolved
+        task = backend.config_manager.task[local_index]
+        return {"success": True, "message": "success", "data": task, "backend": backend.name}
+
+    def _iter_tasks(self):
+        """依次遍历所有实例的任务，返回 (稳定任务ID, 任务)"""
+        for backend in self.backends:
+            config_manager = backend.config_manager
+            for index, task in enumerate(config_manager.task):
+                yield self._task_id(backend, index), task
     
     # 获取任务列表
     async def get_task_list(self):
         try:
-            tasklist = self.config_manager.task
+            tasklist = list(self._iter_tasks())
             if not tasklist:
                 return {"success": False, "message": "没有任务"}
             return {"success": True, "message": "success", "data": tasklist}
         except Exception as e:
             logger.error(f"获取任务列表失败: {e}")
-            return {"success": False, "message": "获取任务列表失败"}
\ No newline at end of file
+            return {"success": False, "message": "获取任务列表失败"}
+
+    def _slice_tasks(self, start: int, end: int) -> List[Tuple[int, Dict]]:
+        """按合并后的位置切片，跳过的实例不逐条遍历"""
+        items = []
+        for backend in self.backends:
+            config_manager = backend.config_manager
+            tasklist = config_manager.task
+            if start < len(tasklist) and end > 0:
+                items.extend(
+                    (self._task_id(backend, index), task)
+                    for index, task in enumerate(tasklist[max(start, 0):end], max(start, 0))
+                )
+            start -= len(tasklist)
+            end -= len(tasklist)
+        return items
+
+    # 分页获取任务列表
+    async def get_task_page(self, page: int = 1, keyword: Optional[str] = None):
+        """按页获取任务列表，keyword 为 ban/失效 时筛选失效任务，否则按任务名筛选"""
+        count = sum(len(backend.config_manager.task) for backend in self.backends)
+        if not count:
+            return {"success": False, "message": "没有任务"}
+        if keyword in ("ban", "失效"):
+            matched = [(task_id, task) for task_id, task in self._iter_tasks() if task.get("shareurl_ban")]
+        elif keyword:
+            keyword = keyword.lower()
+            matched = [(task_id, task) for task_id, task in self._iter_tasks()
+                       if keyword in task.get("taskname", "").lower()]
+        else:
+            matched = None
+        total = count if matched is None else len(matched)
+        if total == 0:
+            return {"success": False, "message": "没有匹配的任务"}
+        pages = (total + self.list_page_size - 1) // self.list_page_size
+        if page < 1 or page > pages:
+            return {"success": False, "message": f"页码超出范围，共 {pages} 页"}
+        start = (page - 1) * self.list_page_size
+        end = start + self.list_page_size
+        if matched is None:
+            items = self._slice_tasks(start, end)
+        else:
+            items = matched[start:end]
+        return {
+            "success": True,
+            "message": "success",
+            "data": {"items": items, "page": page, "pages": pages, "total": total},
+        }
\ No newline at end of file
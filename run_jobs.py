@@ -0,0 +1,121 @@
+import time
+import asyncio
+import itertools
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+from astrbot.api import logger
+
+# 单条进度消息的最大长度，超出部分只保留末尾
+MAX_PROGRESS_CHARS = 1500
+
+
+class RunJob:
+    """后台运行任务"""
+
+    def __init__(self, job_id: int, description: str):
+        self.id = job_id
+        self.description = description
+        self.status = "running"
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.output_bytes = 0
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status != "running"
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class RunJobManager:
+    """管理后台运行任务，将输出按时间间隔分批推送"""
+
+    def __init__(self, progress_interval: float = 10, max_history: int = 20):
+        self.progress_interval = max(1.0, float(progress_interval or 10))
+        self.max_history = max(1, int(max_history or 20))
+        self._jobs: "OrderedDict[int, RunJob]" = OrderedDict()
+        self._ids = itertools.count(1)
+
+    def submit(
+        self,
+        stream: AsyncIterator[str],
+        description: str,
+        notify: Callable[[str], Awaitable[None]],
+    ) -> RunJob:
+        """提交后台任务，立即返回"""
+        job = RunJob(next(self._ids), description)
+        job.task = asyncio.create_task(self._run(job, stream, notify))
+        self._jobs[job.id] = job
+        self._prune()
+        return job
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        while len(self._jobs) > self.max_history and finished:
+            del self._jobs[finished.pop(0)]
+
+    async def _notify(self, notify: Callable[[str], Awaitable[None]], text: str):
+        try:
+            await notify(text)
+        except Exception as e:
+            logger.warning(f"发送任务进度失败: {e}")
+
+    async def _flush(self, job: RunJob, buffer: List[str], notify: Callable[[str], Awaitable[None]]):
+        text = "".join(buffer).strip()
+        buffer.clear()
+        if not text:
+            return
+        if len(text) > MAX_PROGRESS_CHARS:
+            text = "...\n" + text[-MAX_PROGRESS_CHARS:]
+        await self._notify(notify, f"[任务 #{job.id}] {job.description}\n{text}")
+
+    async def _run(self, job: RunJob, stream: AsyncIterator[str], notify: Callable[[str], Awaitable[None]]):
+        buffer: List[str] = []
+        last_flush = time.monotonic()
+        try:
+            async for chunk in stream:
+                job.output_bytes += len(chunk.encode("utf-8"))
+                buffer.append(chunk)
+                if time.monotonic() - last_flush >= self.progress_interval:
+                    await self._flush(job, buffer, notify)
+                    last_flush = time.monotonic()
+            job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            logger.error(f"任务 #{job.id} 执行失败: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+        await self._flush(job, buffer, notify)
+        summary = {"done": "执行完成", "cancelled": "已取消", "failed": f"执行失败: {job.error}"}[job.status]
+        await self._notify(notify, f"[任务 #{job.id}] {job.description} {summary}，耗时 {job.elapsed:.0f} 秒")
+
+    def list(self) -> List[RunJob]:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: int) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job.done or job.task is None:
+            return False
+        job.task.cancel()
+        return True
+
+    async def close(self):
+        """取消所有运行中的任务"""
+        tasks = [job.task for job in self._jobs.values() if not job.done and job.task]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
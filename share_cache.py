@@ -0,0 +1,88 @@
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class ShareDetailCache:
+    """分享详情缓存，LRU + TTL，失效链接使用较短的缓存时间，相同请求合并为一次"""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 600, negative_ttl: float = 60):
+        self.maxsize = max(1, int(maxsize or 512))
+        self.ttl = float(ttl or 0)
+        self.negative_ttl = float(negative_ttl or 0)
+        self._data: "OrderedDict[Hashable, Tuple[float, Dict]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.negative_hits = 0
+
+    def _get(self, key: Hashable) -> Optional[Dict]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def _ttl_for(self, value: Dict) -> float:
+        if value.get("success") is True:
+            return self.ttl
+        # 仅缓存服务端明确返回的失败结果（链接失效、被封禁等），网络错误不缓存
+        if "data" in value:
+            return self.negative_ttl
+        return 0
+
+    def _set(self, key: Hashable, value: Dict):
+        ttl = self._ttl_for(value)
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Dict]]) -> Dict:
+        """优先从缓存读取，未命中时调用 fetch，同一 key 的并发请求共享同一次调用"""
+        value = self._get(key)
+        if value is not None:
+            self.hits += 1
+            if value.get("success") is not True:
+                self.negative_hits += 1
+            return value
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # 请求在独立的任务中执行，发起请求的调用方被取消时不影响其他等待者
+            task = asyncio.create_task(self._fetch(key, fetch))
+            # 避免无人等待时出现 "exception was never retrieved" 警告
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Dict]]) -> Dict:
+        try:
+            value = await fetch()
+            self._set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from astrbot.api import logger
+from .backends import Backend
+from .link_extractor import extract_share_id
+
+# 参与指纹计算的文件字段，stoken 等每次请求都会变化的字段不参与
+FINGERPRINT_FIELDS = ("fid", "file_name", "size", "updated_at", "include_items")
+
+
+def share_fingerprint(detail: Dict) -> str:
+    """根据分享详情中的文件列表计算指纹，文件增删、改名或更新时指纹变化"""
+    files = detail.get("list") or []
+    rows = sorted(
+        [str(item.get(field, "")) for field in FINGERPRINT_FIELDS]
+        for item in files if isinstance(item, dict)
+    )
+    body = json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+
+class ShareWatcher:
+    """定时检查各任务的分享内容，只运行分享有更新或失效标记已清除的任务
+
+    指纹按 "实例/分享ID" 保存在本地文件中，首次检查只记录指纹，不运行任务
+    """
+
+    def __init__(
+        self,
+        backends: List[Backend],
+        fetch_detail: Callable[[str], Awaitable[Dict]],
+        run_stream: Callable[[Backend, int], AsyncIterator[str]],
+        path: Optional[str] = None,
+        interval: float = 0,
+        concurrency: int = 3,
+    ):
+        self.backends = backends
+        self.fetch_detail = fetch_detail
+        self.run_stream = run_stream
+        self.path = path
+        self.interval = float(interval or 0)
+        self.concurrency = max(1, int(concurrency or 3))
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def load(self):
+        """读取上次保存的指纹"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取分享指纹失败: {e}")
+            return
+        if isinstance(state, dict):
+            self._state = state
+
+    def _write(self, body: str):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp_path, self.path)
+
+    async def _save(self):
+        if not self.path:
+            return
+        body = json.dumps(self._state, ensure_ascii=False, separators=(",", ":"))
+        try:
+            await asyncio.to_thread(self._write, body)
+        except OSError as e:
+            logger.warning(f"保存分享指纹失败: {e}")
+
+    def start(self):
+        """按间隔定时检查，interval 为0时不启动"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            # 加入随机抖动，避免多个插件实例同时检查
+            await asyncio.sleep(self.interval * random.uniform(0.9, 1.1))
+            try:
+                result = await self.check()
+                logger.info(
+                    f"分享检查完成：检查 {result['checked']} 个，运行 {result['started']} 个，"
+                    f"失效 {result['banned']} 个，失败 {result['errors']} 个"
+                )
+            except Exception as e:
+                logger.error(f"分享检查失败: {e}")
+
+    async def _probe(self, semaphore: asyncio.Semaphore, shareurl: str) -> Tuple[str, Optional[str]]:
+        """返回 (状态, 指纹)，状态为 ok、banned 或 error"""
+        async with semaphore:
+            try:
+                detail = await self.fetch_detail(shareurl)
+            except Exception as e:
+                logger.warning(f"获取分享详情失败 {shareurl}: {e}")
+                return "error", None
+        if detail.get("success") is True:
+            return "ok", share_fingerprint(detail.get("data") or {})
+        # 服务端明确返回的失败视为链接失效，网络错误等不改变记录的状态
+        return ("banned" if "data" in detail else "error"), None
+
+    async def _run_tasks(self, backend: Backend, share_ids: List[str]) -> int:
+        """依次运行实例上的变化任务，运行前重新查找索引，返回实际运行的任务数"""
+        started = 0
+        for share_id in share_ids:
+            index = backend.config_manager.find_by_share_id(share_id)
+            if index is None:
+                continue
+            started += 1
+            try:
+                async for _ in self.run_stream(backend, index):
+                    pass
+            except Exception as e:
+                logger.warning(f"运行任务失败 {share_id}: {e}")
+        return started
+
+    async def check(self) -> Dict[str, Any]:
+        """检查一次所有任务，运行分享有变化的任务，同一时间只进行一次检查"""
+        async with self._lock:
+            started_at = time.time()
+            baseline = not self._state
+            entries = []
+            for backend in self.backends:
+                if not backend.config_manager.loaded:
+                    continue
+                for task in backend.config_manager.task:
+                    share_id = extract_share_id(task.get("shareurl", ""))
+                    if share_id:
+                        entries.append((backend, share_id, task))
+            semaphore = asyncio.Semaphore(self.concurrency)
+            probes = await asyncio.gather(*(self._probe(semaphore, task["shareurl"]) for _, _, task in entries))
+
+            state: Dict[str, Dict[str, Any]] = {}
+            changed: Dict[int, List[str]] = defaultdict(list)
+            counts = {"banned": 0, "errors": 0}
+            for (backend, share_id, task), (status, fingerprint) in zip(entries, probes):
+                key = f"{backend.name}/{share_id}"
+                previous = self._state.get(key)
+                if status == "error":
+                    counts["errors"] += 1
+                    if previous is not None:
+                        state[key] = previous
+                    continue
+                if status == "banned":
+                    counts["banned"] += 1
+                    state[key] = {"fingerprint": previous and previous.get("fingerprint"), "ban": True}
+                    continue
+                # quark-auto-save 会跳过标记为失效的任务，标记清除后才需要运行
+                banned = bool(task.get("shareurl_ban"))
+                state[key] = {"fingerprint": fingerprint, "ban": banned}
+                if banned:
+                    continue
+                if previous is None:
+                    run = not baseline
+                else:
+                    run = previous.get("fingerprint") != fingerprint or bool(previous.get("ban"))
+                if run and share_id not in changed[backend.number]:
+                    changed[backend.number].append(share_id)
+            self._state = state
+            await self._save()
+
+            # 各实例同时运行，实例内依次运行
+            started = await asyncio.gather(*(
+                self._run_tasks(self.backends[number], share_ids) for number, share_ids in changed.items()
+            ))
+            self.last_result = {
+                "checked": len(entries),
+                "changed": sum(len(share_ids) for share_ids in changed.values()),
+                "started": sum(started),
+                "banned": counts["banned"],
+                "errors": counts["errors"],
+                "baseline": baseline,
+                "started_at": started_at,
+                "elapsed": time.time() - started_at,
+            }
+            return self.last_result
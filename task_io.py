@@ -0,0 +1,93 @@
+import os
+import csv
+import json
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+# 导入导出的任务字段
+TASK_FIELDS = ("taskname", "shareurl", "savepath", "pattern", "replace", "update_subdir")
+
+
+def detect_format(path: str) -> str:
+    """根据扩展名判断文件格式，默认为 jsonl"""
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """逐行读取 JSONL 或 CSV 文件中的任务记录"""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if detect_format(path) == "csv":
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield {"_error": f"无法解析: {line[:50]}"}
+                continue
+            yield record if isinstance(record, dict) else {"_error": f"不是对象: {line[:50]}"}
+
+
+def validate_records(records: Iterable[Dict], extract_share_id: Callable[[str], Optional[str]],
+                     stats: Dict[str, int]) -> Iterator[Dict]:
+    """校验并规范化记录，仅保留有效的夸克分享链接"""
+    for record in records:
+        shareurl = str(record.get("shareurl") or "").strip()
+        share_id = extract_share_id(shareurl) if "pan.quark.cn" in shareurl else None
+        if "_error" in record or not share_id:
+            stats["invalid"] += 1
+            continue
+        task = {key: str(record[key]).strip() for key in TASK_FIELDS if record.get(key)}
+        task["shareurl"] = shareurl
+        pwd = str(record.get("pwd") or "").strip()
+        if pwd and "pwd=" not in shareurl:
+            task["shareurl"] = f"{shareurl}?pwd={pwd}"
+        task["_share_id"] = share_id
+        yield task
+
+
+def dedupe_records(records: Iterable[Dict], exists: Callable[[str], bool],
+                   stats: Dict[str, int], seen: Optional[Set[str]] = None) -> Iterator[Dict]:
+    """跳过已存在或文件内重复的分享，分块处理时传入同一个 seen 以跨块去重"""
+    seen = set() if seen is None else seen
+    for record in records:
+        share_id = record["_share_id"]
+        if share_id in seen or exists(share_id):
+            stats["duplicate"] += 1
+            continue
+        seen.add(share_id)
+        yield record
+
+
+def chunked(records: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    """按固定大小分块"""
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_export(path: str, tasks: Iterable[Dict], fmt: str) -> int:
+    """流式写入 JSONL 或 CSV 导出文件，返回导出的任务数"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            # 与导入使用的 csv.DictReader 采用相同的转义规则
+            writer = csv.writer(f)
+            writer.writerow(TASK_FIELDS)
+            for task in tasks:
+                writer.writerow([task.get(key) or "" for key in TASK_FIELDS])
+                count += 1
+        else:
+            for task in tasks:
+                f.write(json.dumps({key: task[key] for key in TASK_FIELDS if key in task}, ensure_ascii=False) + "\n")
+                count += 1
+    os.replace(tmp_path, path)
+    return count
@@ -0,0 +1,116 @@
+import sys
+import json
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Union
+from .link_extractor import extract_share_id
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时使用标准库
+    orjson = None
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    """解析 JSON，安装了 orjson 时使用 orjson"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps_compact(value: Any) -> str:
+    """紧凑序列化，仅用于内部存储，结果可直接传给 json_loads"""
+    if orjson is not None:
+        # orjson 返回的 bytes 带有较大的预分配空间，转为 str 只保留实际内容
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+# 表示任务中没有该字段，与值为 None 区分
+_MISSING = object()
+
+# 插件读取的任务字段，其余字段序列化后保存，写入时再还原
+TASK_RECORD_FIELDS = ("taskname", "shareurl", "savepath", "pattern", "replace", "update_subdir", "shareurl_ban")
+_FIELD_SET = frozenset(TASK_RECORD_FIELDS)
+# 多个任务常用相同取值的字段，驻留后共用同一个字符串对象
+_INTERNED_FIELDS = ("pattern", "replace", "update_subdir", "shareurl_ban")
+# 任务的键顺序 -> 与还原顺序不同时为该顺序，否则为 None；相同顺序的任务共用同一个元组
+_KEY_ORDERS: Dict[tuple, Optional[tuple]] = {}
+
+
+def _key_order(task: Dict) -> Optional[tuple]:
+    keys = tuple(task)
+    order = _KEY_ORDERS.get(keys, _MISSING)
+    if order is _MISSING:
+        restored = tuple(field for field in TASK_RECORD_FIELDS if field in task)
+        restored += tuple(key for key in keys if key not in _FIELD_SET)
+        order = _KEY_ORDERS[keys] = None if restored == keys else keys
+    return order
+
+
+class TaskRecord(Mapping):
+    """紧凑的只读任务记录，按字典方式读取，to_dict 还原完整任务用于写入"""
+
+    __slots__ = TASK_RECORD_FIELDS + ("share_id", "_extra", "_order")
+
+    @classmethod
+    def from_dict(cls, task: Dict) -> "TaskRecord":
+        record = cls.__new__(cls)
+        get = task.get
+        for field in TASK_RECORD_FIELDS:
+            value = get(field, _MISSING)
+            if field in _INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            setattr(record, field, value)
+        shareurl = record.shareurl
+        record.share_id = extract_share_id(shareurl) if type(shareurl) is str else None
+        extra = {key: value for key, value in task.items() if key not in _FIELD_SET}
+        record._extra = json_dumps_compact(extra) if extra else None
+        # 写回服务端时保持任务原有的键顺序
+        record._order = _key_order(task)
+        return record
+
+    def _extra_dict(self) -> Dict:
+        return json_loads(self._extra) if self._extra is not None else {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        extra = self._extra_dict()
+        if key in extra:
+            return extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        return self._extra_dict().get(key, default)
+
+    def __contains__(self, key: object) -> bool:
+        if key in _FIELD_SET:
+            return getattr(self, key) is not _MISSING
+        return key in self._extra_dict()
+
+    def __iter__(self) -> Iterator[str]:
+        for field in TASK_RECORD_FIELDS:
+            if getattr(self, field) is not _MISSING:
+                yield field
+        yield from self._extra_dict()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict:
+        """还原完整的任务字典，键顺序与原任务相同"""
+        task = {field: getattr(self, field) for field in TASK_RECORD_FIELDS if getattr(self, field) is not _MISSING}
+        task.update(self._extra_dict())
+        if self._order is not None:
+            return {key: task[key] for key in self._order}
+        return task
+
+    def __repr__(self) -> str:
+        return f"TaskRecord({self.to_dict()!r})"
+
@@ -0,0 +1,90 @@
+"""熔断器与 HttpClient 的回归测试，使用 benchmarks 中的模拟 quark-auto-save 服务
+
+需在安装了 AstrBot 的环境中运行：
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import asyncio
+import importlib
+import unittest
+
+import aiohttp
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PLUGIN_DIR, "benchmarks"))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+plugin_package = os.path.basename(PLUGIN_DIR)
+quark_save_api = importlib.import_module(f"{plugin_package}.quark_save_api")
+circuit_breaker = importlib.import_module(f"{plugin_package}.circuit_breaker")
+
+from fake_server import FakeQuarkAutoSave  # noqa: E402
+
+
+class ProbeReleaseTest(unittest.IsolatedAsyncioTestCase):
+    """半开状态的探测请求被取消后，熔断器应能放行下一个探测请求"""
+
+    async def asyncSetUp(self):
+        self.server = FakeQuarkAutoSave(tasks=1, latency=0.5)
+        await self.server.start()
+        self.breaker = circuit_breaker.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        self.http = quark_save_api.HttpClient(self.server.url, self.server.token, retries=0, breaker=self.breaker)
+        # 熔断后等待冷却结束，下一个请求即为探测请求
+        self.breaker.record_failure()
+        await asyncio.sleep(0.06)
+
+    async def asyncTearDown(self):
+        await self.http.close()
+        await self.server.stop()
+
+    async def cancel_soon(self, coro):
+        task = asyncio.create_task(coro)
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.breaker.state, circuit_breaker.CircuitBreaker.HALF_OPEN)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+    async def assert_recovers(self):
+        self.server.latency = 0
+        response = await self.http.request("GET", "data")
+        self.assertIs(response.get("success"), True)
+        self.assertEqual(self.breaker.state, circuit_breaker.CircuitBreaker.CLOSED)
+
+    async def test_cancelled_request(self):
+        await self.cancel_soon(self.http.request("GET", "data"))
+        await self.assert_recovers()
+
+    async def test_cancelled_stream(self):
+        async def consume():
+            async for _ in self.http.stream_text("GET", "run_script_now"):
+                pass
+
+        await self.cancel_soon(consume())
+        await self.assert_recovers()
+
+    async def test_stream_disconnect(self):
+        # 服务端读取请求后直接断开连接，ServerDisconnectedError 计为失败，不会占住探测名额
+        async def hang_up(reader, writer):
+            await reader.readuntil(b"\r\n\r\n")
+            writer.close()
+
+        server = await asyncio.start_server(hang_up, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        base_url = self.http.base_url
+        self.http.base_url = f"http://127.0.0.1:{port}/"
+        try:
+            with self.assertRaises(aiohttp.ServerDisconnectedError):
+                async for _ in self.http.stream_text("GET", "run_script_now"):
+                    pass
+        finally:
+            server.close()
+            await server.wait_closed()
+        self.assertEqual(self.breaker.state, circuit_breaker.CircuitBreaker.OPEN)
+        await asyncio.sleep(0.06)
+        self.http.base_url = base_url
+        await self.assert_recovers()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""分享详情缓存合并请求的回归测试
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import asyncio
+import importlib
+import unittest
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+share_cache = importlib.import_module(f"{os.path.basename(PLUGIN_DIR)}.share_cache")
+
+
+class CoalesceTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cache = share_cache.ShareDetailCache()
+        self.calls = 0
+
+    async def fetch(self):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return {"success": True, "data": {"share": {"title": "资源"}}}
+
+    async def test_first_caller_cancelled(self):
+        # 发起请求的调用方被取消后，合并等待的调用方仍能拿到结果
+        first = asyncio.create_task(self.cache.get_or_fetch("key", self.fetch))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(self.cache.get_or_fetch("key", self.fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        value = await second
+        self.assertIs(value.get("success"), True)
+        self.assertTrue(first.cancelled())
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.cache.stats()["inflight"], 0)
+        # 结果已写入缓存
+        self.assertIs(await self.cache.get_or_fetch("key", self.fetch), value)
+        self.assertEqual(self.calls, 1)
+
+    async def test_error_shared(self):
+        async def fail():
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            self.cache.get_or_fetch("key", fail), self.cache.get_or_fetch("key", fail), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(self.cache.stats()["inflight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()